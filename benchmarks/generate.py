@@ -0,0 +1,96 @@
+from typing import Callable
+import argparse
+import random
+
+# Every generator returns a finished tactic script of the given size, with tactics separated by blank lines
+
+def many_lets(size: int) -> str:
+    tactics = ["description: Many declarations", "signature: many_lets: () -> int"]
+    for index in range(size):
+        tactics.append(f"let: x{index}: int")
+        tactics.append(f"fill: {index}")
+    tactics.extend(["return:", f"fill: x{size - 1}" if size > 0 else "fill: 0", "finish:"])
+    return "\n\n".join(tactics)
+
+def wide_signature(size: int) -> str:
+    parameter_types = ", ".join("int" for _ in range(size))
+    tactics = ["description: Many parameters", f"signature: wide_signature: ({parameter_types}) -> int"]
+    tactics.extend(f"intro: p{index}" for index in range(size))
+    tactics.extend(["return:", "fill: 0", "finish:"])
+    return "\n\n".join(tactics)
+
+def nested_function_type(depth: int) -> str:
+    type_str = "int"
+    for _ in range(depth):
+        type_str = f"({type_str}) -> {type_str}" if len(type_str) < 64 else f"({type_str}) -> int"
+    return type_str
+
+def nested_types(size: int) -> str:
+    tactics = ["description: Deeply nested function types", "signature: nested_types: () -> int"]
+    for index in range(size):
+        tactics.append(f"let: f{index}: {nested_function_type(index % 32 + 1)}")
+        tactics.append("fill: None")
+    tactics.extend(["return:", "fill: 0", "finish:"])
+    return "\n\n".join(tactics)
+
+def heavy_switch(size: int, seed: int = 0) -> str:
+    # Declares all variables first and fills their initializers afterwards in a random order
+    rng = random.Random(seed)
+    tactics = ["description: Many switches", "signature: heavy_switch: () -> int"]
+    for index in range(size):
+        tactics.append(f"let: x{index}: int")
+        tactics.append(f"switch: {index + 1}")
+    tactics.extend(["return:", "fill: 0"])
+    selected = size - 1
+    for remaining in range(size, 0, -1):
+        if remaining > 1:
+            # A random hole other than the selected one
+            index = rng.randrange(remaining - 1)
+            index += index >= selected
+            tactics.append(f"switch: {index}")
+            selected = index
+        tactics.append("fill: 0")
+        # After a fill, the hole following the filled hole is selected
+        selected = min(selected, remaining - 2)
+    tactics.append("finish:")
+    return "\n\n".join(tactics)
+
+def many_functions(size: int) -> str:
+    # Declares all functions first and completes their bodies afterwards in reverse order
+    tactics: list[str] = []
+    for index in range(size):
+        tactics.append(f"description: Function {index}")
+        tactics.append(f"signature: f{index}: (int) -> int")
+    for index in reversed(range(size)):
+        if 0 < index < size - 1:
+            # After a function was completed, the function that is open for the longest time is selected
+            tactics.append(f"switch: f{index} 0")
+        tactics.extend(["intro: x", "return:", f"fill: x + {index}"])
+    tactics.append("finish:")
+    return "\n\n".join(tactics)
+
+def long_sums(size: int) -> str:
+    # Sums are nested as deeply as they have terms, longer sums than about 5000 terms are rejected by the parser of CPython
+    terms = max(1, min(size, 2000))
+    tactics = ["description: Long sums", "signature: long_sums: () -> int"]
+    for index in range(max(1, size // terms)):
+        tactics.append(f"let: x{index}: int")
+        tactics.append(f"fill: {" + ".join("1" for _ in range(terms))}")
+    tactics.extend(["return:", "fill: x0", "finish:"])
+    return "\n\n".join(tactics)
+
+GENERATORS: dict[str, Callable[[int], str]] = {
+    "many_lets": many_lets,
+    "wide_signature": wide_signature,
+    "nested_types": nested_types,
+    "heavy_switch": heavy_switch,
+    "many_functions": many_functions,
+    "long_sums": long_sums,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic tactic script.")
+    parser.add_argument("kind", choices=GENERATORS.keys(), help="The kind of script to generate.")
+    parser.add_argument("size", type=int, help="The size of the script, e.g. the number of declarations.")
+    args = parser.parse_args()
+    print(GENERATORS[args.kind](args.size))
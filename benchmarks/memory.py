@@ -0,0 +1,76 @@
+from dataclasses import fields, is_dataclass, make_dataclass
+from typing import Any, Callable
+import argparse
+import gc
+import tracemalloc
+
+from tactic_interpreter.interpreter import Interpreter, STATEMENT_TACTICS
+from tactic_interpreter.parser import clear_parser_caches
+from tactic_interpreter.program import Block, DescriptionStatement, Hole, Identifier, InjectedExpression, PrimitiveType, ReturnStatement, VariableDeclaration
+
+def measure(factory: Callable[[], Any], count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del nodes
+    return (after - before) / count
+
+def without_slots(cls: type) -> type:
+    # A dict based twin of a node class, as the nodes were defined before
+    return make_dataclass(f"Dict{cls.__name__}", [(field_.name, Any) for field_ in fields(cls)])
+
+def node_footprints(count: int) -> list[tuple[str, float, float]]:
+    int_type = PrimitiveType("int")
+    examples: list[tuple[type, dict[str, Any]]] = [
+        (Hole, {"tactics": STATEMENT_TACTICS}),
+        (Identifier, {"value": "x"}),
+        (InjectedExpression, {"value": "x + 1"}),
+        (DescriptionStatement, {"value": "description"}),
+        (VariableDeclaration, {"name": Identifier("x"), "type_": int_type, "expression": None}),
+        (ReturnStatement, {"value": None}),
+        (Block, {"statements": []}),
+    ]
+    footprints: list[tuple[str, float, float]] = []
+    for cls, values in examples:
+        assert is_dataclass(cls)
+        dict_cls = without_slots(cls)
+        dict_values = {field_.name: values.get(field_.name) for field_ in fields(cls)}
+        dict_size = measure(lambda: dict_cls(**dict_values), count)
+        slots_size = measure(lambda: cls(**values), count)
+        footprints.append((cls.__name__, dict_size, slots_size))
+    return footprints
+
+def session_footprint(declarations: int) -> tuple[float, int]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # Without a history, as the history intentionally keeps the filled holes alive for undoing
+    interpreter = Interpreter(quiet=True, history_limit=0)
+    interpreter.interprete_tactic("description: Benchmark")
+    interpreter.interprete_tactic("signature: benchmark: () -> int")
+    for index in range(declarations):
+        interpreter.interprete_tactic(f"let: x{index}: int")
+        interpreter.interprete_tactic(f"fill: {index}")
+    # The parser caches are bounded and not part of the program
+    clear_parser_caches()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    gc.collect()
+    # Filled holes are spliced out of the program and must not be retained by anything
+    live_holes = sum(1 for object_ in gc.get_objects() if isinstance(object_, Hole))
+    assert live_holes == interpreter.program.hole_count, f"{live_holes} holes are alive, but only {interpreter.program.hole_count} are unfilled"
+    return (after - before) / declarations, live_holes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the memory footprint of the program nodes.")
+    parser.add_argument("--count", type=int, default=100_000, metavar="N", help="Number of nodes allocated per node class.")
+    parser.add_argument("--declarations", type=int, default=2_000, metavar="N", help="Number of declarations in the measured session.")
+    args = parser.parse_args()
+    print(f"{"Node":<24}{"dict (B)":>12}{"slots (B)":>12}{"saved":>8}")
+    for name, dict_size, slots_size in node_footprints(args.count):
+        print(f"{name:<24}{dict_size:>12.1f}{slots_size:>12.1f}{1 - slots_size / dict_size:>8.0%}")
+    per_declaration, live_holes = session_footprint(args.declarations)
+    print(f"\nSession with {args.declarations} declarations: {per_declaration:.1f} B per declaration, {live_holes} live holes")
@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from typing import Callable
+import argparse
+import io
+import time
+import tracemalloc
+
+from benchmarks.generate import GENERATORS, nested_function_type
+from tactic_interpreter.hole_cleaner import HoleCleaner
+from tactic_interpreter.interpreter import Interpreter
+from tactic_interpreter.parser import clear_parser_caches, parse_expression, parse_identifier, parse_type, read_tactics
+from tactic_interpreter.utility import TerminationException
+from tactic_interpreter.visualise import program_to_str
+
+@dataclass
+class Measurement:
+    name: str
+    size: int
+    operations: int
+    seconds: float
+    peak_bytes: int
+
+    def throughput(self) -> float:
+        return self.operations / self.seconds if self.seconds > 0 else float("inf")
+
+def measure(name: str, size: int, operations: int, run: Callable[[], None], trace_memory: bool) -> Measurement:
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    peak_bytes = 0
+    if trace_memory:
+        # A second run, as tracing the allocations distorts the timing
+        tracemalloc.start()
+        run()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return Measurement(name, size, operations, seconds, peak_bytes)
+
+def build_interpreter(tactics: list[str]) -> Interpreter:
+    interpreter = Interpreter(quiet=True)
+    for tactic in tactics:
+        try:
+            interpreter.interprete_tactic(tactic)
+        except TerminationException:
+            break
+    return interpreter
+
+def benchmark_interpreter(size: int, trace_memory: bool) -> list[Measurement]:
+    measurements: list[Measurement] = []
+    for kind, generator in GENERATORS.items():
+        tactics = list(read_tactics(io.StringIO(generator(size))))
+        def run() -> None:
+            clear_parser_caches()
+            build_interpreter(tactics)
+        measurements.append(measure(f"interprete_tactic ({kind})", size, len(tactics), run, trace_memory))
+    return measurements
+
+def benchmark_program(size: int, trace_memory: bool) -> list[Measurement]:
+    # Uses an unfinished program, such that the hole cleaner has holes to collect
+    tactics = list(read_tactics(io.StringIO(GENERATORS["heavy_switch"](size))))
+    program = build_interpreter(tactics[:2 + 2 * size]).program
+    hole_cleaner = HoleCleaner()
+    def clean() -> None:
+        hole_cleaner.clean_holes(program)
+    def render_cold() -> None:
+        hole_cleaner.clean_holes(program)
+        program_to_str(program)
+    def render_warm() -> None:
+        program_to_str(program)
+    return [
+        measure("clean_holes", size, 1, clean, trace_memory),
+        measure("program_to_str (cold)", size, 1, render_cold, trace_memory),
+        measure("program_to_str (warm)", size, 1, render_warm, trace_memory),
+    ]
+
+def benchmark_parser(size: int, trace_memory: bool) -> list[Measurement]:
+    type_strs = [nested_function_type(index % 32 + 1) for index in range(size)]
+    expression_strs = [f"x{index} * {index} + (y - {index % 7})" for index in range(size)]
+    identifier_strs = [f"name_{index % 100}" for index in range(size)]
+    measurements: list[Measurement] = []
+    for name, parse, inputs in [
+        ("parse_type", parse_type, type_strs),
+        ("parse_expression", parse_expression, expression_strs),
+        ("parse_identifier", parse_identifier, identifier_strs),
+    ]:
+        # All caches are cleared, as the parsers share some of them, e.g. parse_expression and parse_expression_tree
+        def run_uncached() -> None:
+            for input_str in inputs:
+                clear_parser_caches()
+                parse(input_str)
+        def run_cached() -> None:
+            clear_parser_caches()
+            for input_str in inputs:
+                parse(input_str)
+        measurements.append(measure(f"{name} (uncached)", size, len(inputs), run_uncached, trace_memory))
+        measurements.append(measure(f"{name} (cached)", size, len(inputs), run_cached, trace_memory))
+    return measurements
+
+def print_measurements(measurements: list[Measurement]) -> None:
+    print(f"{"Benchmark":<36}{"size":>8}{"seconds":>12}{"ops/s":>14}{"peak KiB":>12}")
+    for measurement in measurements:
+        print(
+            f"{measurement.name:<36}{measurement.size:>8}{measurement.seconds:>12.4f}"
+            f"{measurement.throughput():>14.0f}{measurement.peak_bytes / 1024:>12.1f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the hot paths of the interpreter on synthetic scripts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], metavar="N", help="The sizes of the generated scripts.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the second run that measures the peak memory.")
+    args = parser.parse_args()
+    measurements: list[Measurement] = []
+    for size in args.sizes:
+        measurements.extend(benchmark_interpreter(size, not args.no_memory))
+        measurements.extend(benchmark_program(size, not args.no_memory))
+        measurements.extend(benchmark_parser(size, not args.no_memory))
+    print_measurements(measurements)
@@ -1,7 +1,36 @@
+from contextlib import ExitStack
+from dataclasses import asdict
 from pathlib import Path
+from typing import Optional
 import argparse
+import json
+import sys
 
-from tactic_interpreter.interpreter import Interpreter
+from tactic_interpreter.instrumentation import HookChain, InterpreterHooks, Profiler
+from tactic_interpreter.interpreter import HISTORY_LIMIT, JSON_OUTPUT_MODES, OUTPUT_MODES, Interpreter, InterpretationResult
+from tactic_interpreter.trace import TraceRecorder
+from tactic_interpreter.utility import CheckpointError, TraceError, pad_str
+from tactic_interpreter.validation import ValidationResult, validate_file, validate_stream
+
+def print_result(result: InterpretationResult) -> None:
+    for failure in result.failures:
+        print(f"Error in tactic {failure.number}: {failure.message}")
+    if result.finished:
+        print(f"Finished the program:")
+    else:
+        print(f"Unfinished program ({result.remaining_holes} unfilled holes):")
+    print(pad_str(result.program, "| "))
+
+def print_result_event(result: InterpretationResult) -> None:
+    print(json.dumps({"event": "result", **asdict(result)}, separators=(",", ":")))
+
+def print_validation(result: ValidationResult) -> None:
+    for failure in result.failures:
+        print(f"Error in tactic {failure.number}: {failure.message}")
+    print(f"{len(result.failures)} static errors in {result.tactic_count} tactics")
+
+def print_validation_event(result: ValidationResult) -> None:
+    print(json.dumps({"event": "validation", **asdict(result)}, separators=(",", ":")))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -15,13 +44,161 @@ if __name__ == "__main__":
         type=Path,
         metavar="PATH",
         help=(
-            "Path to a file to interpret. "
+            "Path to a file to interpret, or '-' to read the tactics from the standard input. "
             "If omitted, the interpreter starts in interactive mode."
         ),
     )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=(
+            "Only report errors and the final program instead of the program after every tactic. "
+            "Exits with a non-zero status if the program was not finished. "
+            "Requires --file."
+        ),
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help=(
+            "Only parse every tactic of the file and report all syntax errors at once, without running the interpreter. "
+            "Exits with a non-zero status if there are errors. "
+            "Requires --file."
+        ),
+    )
+    parser.add_argument(
+        "--output",
+        choices=OUTPUT_MODES,
+        default="full",
+        help=(
+            "Whether the whole program is printed after every tactic, only the changed lines "
+            "as hunks like those of 'diff -U0', or one JSON event per line with the program "
+            "as rendered lines ('json') or as serialized AST ('json-ast')."
+        ),
+    )
+    parser.add_argument(
+        "--history-limit",
+        type=int,
+        default=HISTORY_LIMIT,
+        metavar="N",
+        help=(
+            f"The number of tactics that can be undone (default: {HISTORY_LIMIT}). "
+            "Every undoable tactic keeps the parts of the program it replaced in memory, "
+            "so larger limits use more memory in long sessions."
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="PATH",
+        help=(
+            "Path to a file to which the timing, allocations and program size of every tactic "
+            "are written as JSON lines."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        type=Path,
+        metavar="PATH",
+        help="Path to a checkpoint from which the session is resumed instead of starting with an empty program.",
+    )
+    parser.add_argument(
+        "--record",
+        type=Path,
+        metavar="PATH",
+        help=(
+            "Path to a trace to which every tactic of the session is appended as a JSON line, "
+            "with its parsed arguments if it was accepted and its error if it was rejected."
+        ),
+    )
+    parser.add_argument(
+        "--replay",
+        type=Path,
+        metavar="PATH",
+        help=(
+            "Path to a trace from which the session is restored by applying the accepted tactics with their recorded arguments, "
+            "without parsing, type checking or printing them."
+        ),
+    )
+    parser.add_argument(
+        "--save",
+        type=Path,
+        metavar="PATH",
+        help="Path to which a checkpoint of the session is written when the session ends.",
+    )
     args = parser.parse_args()
-    interpreter = Interpreter()
-    if args.file is None:
-        interpreter.interprete_interactive()
-    else:
-        interpreter.interprete_file(args.file)
\ No newline at end of file
+    if args.batch and args.file is None:
+        parser.error("--batch requires --file")
+    if args.history_limit < 0:
+        parser.error("--history-limit must not be negative")
+    if args.resume is not None and args.replay is not None:
+        parser.error("--resume and --replay can not be combined")
+    if args.check:
+        if args.file is None:
+            parser.error("--check requires --file")
+        try:
+            validation = validate_stream(sys.stdin) if str(args.file) == "-" else validate_file(args.file)
+        except (OSError, UnicodeDecodeError) as e:
+            parser.error(f"Can not read {str(args.file)!r}: {e}")
+        if args.output in JSON_OUTPUT_MODES:
+            print_validation_event(validation)
+        else:
+            print_validation(validation)
+        sys.exit(0 if len(validation.failures) == 0 else 1)
+    with ExitStack() as stack:
+        hooks: list[InterpreterHooks] = []
+        if args.profile is not None:
+            hooks.append(Profiler(stack.enter_context(args.profile.open("w"))))
+        if args.record is not None:
+            hooks.append(TraceRecorder(stack.enter_context(args.record.open("a"))))
+        restored = args.resume is not None or args.replay is not None
+        interpreter = Interpreter(
+            quiet=args.batch or restored,
+            hooks=None if len(hooks) == 0 else hooks[0] if len(hooks) == 1 else HookChain(hooks),
+            history_limit=args.history_limit,
+            output_mode=args.output
+        )
+        if args.resume is not None:
+            try:
+                interpreter.load_checkpoint(args.resume)
+            except (OSError, CheckpointError) as e:
+                parser.error(f"Can not resume from {str(args.resume)!r}: {e}")
+        replayed: Optional[InterpretationResult] = None
+        if args.replay is not None:
+            try:
+                replayed = interpreter.replay_file(args.replay)
+            except (OSError, UnicodeDecodeError, TraceError) as e:
+                parser.error(f"Can not replay {str(args.replay)!r}: {e}")
+        if restored:
+            interpreter.quiet = args.batch
+            if interpreter.finished:
+                # Like after the finish tactic, no more tactics are read once the resumed or replayed session was finished
+                result = replayed if replayed is not None else interpreter.get_result(0, [])
+                if args.batch:
+                    if args.output in JSON_OUTPUT_MODES:
+                        print_result_event(result)
+                    else:
+                        print_result(result)
+                else:
+                    interpreter.print_program("Finished the program", False)
+                sys.exit(0)
+            interpreter.print_program("Resumed program" if args.resume is not None else "Replayed program")
+        if args.save is not None:
+            stack.callback(interpreter.save_checkpoint, args.save)
+        if args.file is None:
+            try:
+                interpreter.interprete_interactive()
+            except (EOFError, KeyboardInterrupt):
+                if args.output not in JSON_OUTPUT_MODES:
+                    print()
+        else:
+            if str(args.file) == "-":
+                result = interpreter.interprete_stream(sys.stdin)
+            else:
+                result = interpreter.interprete_file(args.file)
+            if args.batch:
+                if args.output in JSON_OUTPUT_MODES:
+                    print_result_event(result)
+                else:
+                    print_result(result)
+                sys.exit(0 if result.finished else 1)
@@ -0,0 +1,205 @@
+from pathlib import Path
+from typing import Any, Optional
+import json
+
+from tactic_interpreter.parser import PRIMITIVES
+from tactic_interpreter.program import Block, CompositeStatement, DescriptionStatement, EmptyStatement, Expression, FunctionDeclaration, FunctionType, Hole, Identifier, InjectedExpression, PrimitiveType, Program, ReturnStatement, Statement, Type, VariableDeclaration
+from tactic_interpreter.tactics import TACTIC_REGISTRY
+from tactic_interpreter.utility import CheckpointError, UnexpectedValueError
+
+CHECKPOINT_VERSION = 3
+# Version 1 only has a single function, whose selected hole is stored as an index. Versions before 3 have no hole identifiers
+SUPPORTED_CHECKPOINT_VERSIONS = frozenset({1, 2, 3})
+
+# Nodes are stored as compact JSON values: identifiers, expressions and primitive types are plain strings,
+# all other nodes are lists starting with a tag. The hole indices are implied by the order of the holes.
+
+def hole_to_data(hole: Hole) -> list[Any]:
+    return ["hole", sorted(TACTIC_REGISTRY.get_names(hole.tactics)), hole.id]
+
+def type_to_data(type_: Type) -> Any:
+    match type_:
+        case PrimitiveType(value):
+            return value
+        case FunctionType(parameter_types, return_type):
+            return ["function", [type_to_data(parameter_type) for parameter_type in parameter_types], type_to_data(return_type)]
+        case _:
+            raise UnexpectedValueError(type_)
+
+def identifier_to_data(identifier: Identifier | Hole) -> Any:
+    match identifier:
+        case Hole():
+            return hole_to_data(identifier)
+        case Identifier(value):
+            return value
+        case _:
+            raise UnexpectedValueError(identifier)
+
+def expression_to_data(expression: Expression | Hole) -> Any:
+    match expression:
+        case Hole():
+            return hole_to_data(expression)
+        case InjectedExpression(value):
+            return value
+        case _:
+            raise UnexpectedValueError(expression)
+
+def statement_to_data(statement: Statement | Hole) -> list[Any]:
+    match statement:
+        case Hole():
+            return hole_to_data(statement)
+        case EmptyStatement():
+            return ["empty"]
+        case DescriptionStatement(value):
+            return ["description", value]
+        case CompositeStatement(first, second):
+            return ["composite", statement_to_data(first), statement_to_data(second)]
+        case Block(statements):
+            return ["block", [statement_to_data(sub_statement) for sub_statement in statements]]
+        case FunctionDeclaration(name, function_type, parameters, statement_):
+            return [
+                "function",
+                identifier_to_data(name),
+                type_to_data(function_type),
+                [identifier_to_data(parameter) for parameter in parameters],
+                statement_to_data(statement_)
+            ]
+        case VariableDeclaration(name, type_, expression):
+            return ["let", identifier_to_data(name), type_to_data(type_), expression_to_data(expression)]
+        case ReturnStatement(expression):
+            return ["return", expression_to_data(expression)]
+        case _:
+            raise UnexpectedValueError(statement)
+
+class CheckpointDecoder:
+    def __init__(self):
+        self.masks: dict[tuple[str, ...], int] = {} # the tactic masks of the loaded holes by their tactics
+        self.hole_ids: set[int] = set() # the identifiers of the loaded holes
+        self.next_hole_id = 0 # the identifier after the largest loaded one
+
+    def data_to_hole(self, data: Any) -> Hole:
+        tactics = tuple(data[1])
+        if tactics not in self.masks:
+            try:
+                self.masks[tactics] = TACTIC_REGISTRY.get_mask(tactics)
+            except (KeyError, TypeError):
+                raise CheckpointError(f"Invalid hole {data!r}")
+        hole = Hole(self.masks[tactics])
+        match data:
+            case [_, _]:
+                # Holes without identifier get a new one when the holes are collected
+                pass
+            case [_, _, int(id)] if id >= 0 and id not in self.hole_ids:
+                hole.id = id
+                self.hole_ids.add(id)
+                self.next_hole_id = max(self.next_hole_id, id + 1)
+            case _:
+                raise CheckpointError(f"Invalid hole {data!r}")
+        return hole
+
+    def data_to_type(self, data: Any) -> Type:
+        match data:
+            case str() if data in PRIMITIVES:
+                return PrimitiveType(data) # type:ignore
+            case ["function", parameter_types, return_type]:
+                return FunctionType([self.data_to_type(parameter_type) for parameter_type in parameter_types], self.data_to_type(return_type))
+            case _:
+                raise CheckpointError(f"Invalid type {data!r}")
+
+    def data_to_identifier(self, data: Any) -> Identifier | Hole:
+        match data:
+            case str():
+                return Identifier(data)
+            case ["hole", list(), *_]:
+                return self.data_to_hole(data)
+            case _:
+                raise CheckpointError(f"Invalid identifier {data!r}")
+
+    def data_to_expression(self, data: Any) -> Expression | Hole:
+        match data:
+            case str():
+                return InjectedExpression(data)
+            case ["hole", list(), *_]:
+                return self.data_to_hole(data)
+            case _:
+                raise CheckpointError(f"Invalid expression {data!r}")
+
+    def data_to_statement(self, data: Any) -> Statement | Hole:
+        match data:
+            case ["hole", list(), *_]:
+                return self.data_to_hole(data)
+            case ["empty"]:
+                return EmptyStatement()
+            case ["description", str(value)]:
+                return DescriptionStatement(value)
+            case ["composite", first, second]:
+                return CompositeStatement(self.data_to_statement(first), self.data_to_statement(second))
+            case ["block", list(statements)]:
+                return Block([self.data_to_statement(statement) for statement in statements])
+            case ["function", name, function_type, list(parameters), statement]:
+                function_type = self.data_to_type(function_type)
+                if not isinstance(function_type, FunctionType):
+                    raise CheckpointError(f"Invalid function type {data[2]!r}")
+                return FunctionDeclaration(
+                    self.data_to_identifier(name), # type:ignore
+                    function_type,
+                    [self.data_to_identifier(parameter) for parameter in parameters],
+                    self.data_to_statement(statement)
+                )
+            case ["let", name, type_, expression]:
+                return VariableDeclaration(self.data_to_identifier(name), self.data_to_type(type_), self.data_to_expression(expression)) # type:ignore
+            case ["return", expression]:
+                return ReturnStatement(self.data_to_expression(expression))
+            case _:
+                raise CheckpointError(f"Invalid statement {data!r}")
+
+def get_selected_data(program: Program) -> Optional[list[int]]:
+    hole = program.selected_hole
+    if hole is None or hole.function is None:
+        return None
+    program.number_holes()
+    return [hole.function.position, hole.index]
+
+def program_to_checkpoint(program: Program, finished: bool = False) -> dict[str, Any]:
+    return {
+        "version": CHECKPOINT_VERSION,
+        "program": statement_to_data(program.statement),
+        "next_hole_id": program.next_hole_id,
+        "selected": get_selected_data(program),
+        "finished": finished,
+    }
+
+def checkpoint_to_program(checkpoint: Any) -> tuple[Program, Optional[tuple[int, int]], bool]:
+    # Returns the program without its holes being collected, the position of the function and the index of the selected hole
+    # and whether the program was finished
+    if not isinstance(checkpoint, dict) or checkpoint.get("version") not in SUPPORTED_CHECKPOINT_VERSIONS:
+        raise CheckpointError(f"Unsupported checkpoint version, expected version {CHECKPOINT_VERSION}")
+    match checkpoint.get("selected"):
+        case None:
+            selected = None
+        case int(index):
+            selected = (0, index)
+        case [int(position), int(index)]:
+            selected = (position, index)
+        case data:
+            raise CheckpointError(f"Invalid selected hole {data!r}")
+    next_hole_id = checkpoint.get("next_hole_id", 0)
+    if not isinstance(next_hole_id, int) or next_hole_id < 0:
+        raise CheckpointError(f"Invalid next hole identifier {next_hole_id!r}")
+    decoder = CheckpointDecoder()
+    program = Program(decoder.data_to_statement(checkpoint.get("program")))
+    # Identifiers are not reused, such that holes keep their identifiers across saving and resuming
+    program.next_hole_id = max(next_hole_id, decoder.next_hole_id)
+    return program, selected, bool(checkpoint.get("finished", False))
+
+def save_checkpoint(path: str | Path, program: Program, finished: bool = False) -> None:
+    with Path(path).open("w") as stream:
+        json.dump(program_to_checkpoint(program, finished), stream, separators=(",", ":"))
+
+def load_checkpoint(path: str | Path) -> tuple[Program, Optional[tuple[int, int]], bool]:
+    with Path(path).open() as stream:
+        try:
+            checkpoint = json.load(stream)
+        except json.JSONDecodeError as e:
+            raise CheckpointError(f"Invalid checkpoint: {e}")
+    return checkpoint_to_program(checkpoint)
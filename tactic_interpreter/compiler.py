@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from importlib.util import MAGIC_NUMBER
+from multiprocessing import Pool, TimeoutError as PoolTimeoutError
+from multiprocessing.pool import Pool as PoolType
+from pathlib import Path
+from types import CodeType
+from typing import Any, Callable, Iterable, Optional, Sequence
+import hashlib
+import json
+import marshal
+import os
+
+from tactic_interpreter.checkpoint import statement_to_data
+from tactic_interpreter.program import Program
+from tactic_interpreter.utility import CompilationError
+from tactic_interpreter.visualise import program_to_str
+
+COMPILER_CACHE_SIZE = 4096
+
+@dataclass
+class CallOutcome:
+    value: Any = None
+    error: Optional[str] = None # set if the call raised an exception
+
+worker_function: Any = None # the function that is called by a call process
+worker_run = -1 # the run of the loaded function, see ProgramCompiler.run_function_isolated
+
+def call_function(function: Any, arguments: Sequence[Any]) -> CallOutcome:
+    try:
+        return CallOutcome(function(*arguments))
+    except Exception as e:
+        return CallOutcome(error=f"{type(e).__name__}: {e}")
+
+def load_worker_function(code_data: bytes, name: str) -> None:
+    global worker_function
+    namespace: dict[str, Any] = {"__name__": "__program__", "Callable": Callable}
+    exec(marshal.loads(code_data), namespace)
+    worker_function = namespace[name]
+
+def call_worker_function(run: int, code_data: bytes, name: str, arguments: Sequence[Any]) -> CallOutcome:
+    # The function is loaded by the first call of every run, such that the calls of different runs can not interfere
+    global worker_run
+    if worker_run != run:
+        load_worker_function(code_data, name)
+        worker_run = run
+    return call_function(worker_function, arguments)
+
+def program_key(program: Program) -> str:
+    # Structurally equal programs have the same key, as it hashes their serialized AST instead of the rendered source
+    data = json.dumps(statement_to_data(program.statement), separators=(",", ":"))
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+class ProgramCompiler:
+    def __init__(self, cache_dir: Optional[str | Path] = None, cache_size: int = COMPILER_CACHE_SIZE):
+        self.cache_dir = None if cache_dir is None else Path(cache_dir) # code objects are additionally stored there as marshal files
+        self.cache_size = cache_size
+        self.cache: dict[str, CodeType] = {} # the compiled programs by key, in the order of their last use
+        self.call_pool: Optional[PoolType] = None # the call process, which is kept between runs unless a call times out
+        self.run_count = 0
+
+    def get_cache_path(self, key: str) -> Optional[Path]:
+        return None if self.cache_dir is None else self.cache_dir / f"{key}.bin"
+
+    def load_code(self, key: str) -> Optional[CodeType]:
+        # Code objects of other Python versions are ignored, as marshal files are only compatible within a version
+        path = self.get_cache_path(key)
+        if path is None:
+            return None
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        if not data.startswith(MAGIC_NUMBER):
+            return None
+        try:
+            code = marshal.loads(data[len(MAGIC_NUMBER):])
+        except (EOFError, ValueError, TypeError):
+            return None
+        return code if isinstance(code, CodeType) else None
+
+    def store_code(self, key: str, code: CodeType) -> None:
+        # The file is written under a temporary name and then renamed, such that concurrent readers never see a partial file
+        path = self.get_cache_path(key)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temporary_path.write_bytes(MAGIC_NUMBER + marshal.dumps(code))
+        os.replace(temporary_path, path)
+
+    def remember(self, key: str, code: CodeType) -> None:
+        self.cache[key] = code
+        if len(self.cache) > self.cache_size:
+            del self.cache[next(iter(self.cache))]
+
+    def compile_program(self, program: Program) -> CodeType:
+        if program.hole_count > 0:
+            raise CompilationError(f"The program still has {program.hole_count} unfilled holes")
+        key = program_key(program)
+        code = self.cache.pop(key, None) or self.load_code(key)
+        if code is None:
+            try:
+                code = compile(program_to_str(program), f"<program {key}>", "exec")
+            except (SyntaxError, ValueError) as e:
+                raise CompilationError(f"The program can not be compiled: {e}")
+            self.store_code(key, code)
+        self.remember(key, code)
+        return code
+
+    def load_function(self, program: Program, name: str) -> Any:
+        # Every load executes the module in a fresh namespace, such that calls of different programs can not interfere
+        code = self.compile_program(program)
+        if name not in program.function_index:
+            raise CompilationError(f"There is no function named {name!r}")
+        # The annotations of the signatures are evaluated when the module is executed
+        namespace: dict[str, Any] = {"__name__": "__program__", "Callable": Callable}
+        exec(code, namespace)
+        return namespace[name]
+
+    def run_function(self, program: Program, name: str, inputs: Iterable[Sequence[Any]], timeout: Optional[float] = None) -> list[CallOutcome]:
+        if timeout is not None:
+            return self.run_function_isolated(program, name, inputs, timeout)
+        function = self.load_function(program, name)
+        return [call_function(function, arguments) for arguments in inputs]
+
+    def run_function_isolated(self, program: Program, name: str, inputs: Iterable[Sequence[Any]], timeout: float) -> list[CallOutcome]:
+        # The calls run in a separate process, which is killed if a call does not return in time (e.g. an endless loop) and
+        # replaced for the following calls. Arguments and return values are therefore pickled
+        code = self.compile_program(program)
+        if name not in program.function_index:
+            raise CompilationError(f"There is no function named {name!r}")
+        code_data = marshal.dumps(code)
+        self.run_count += 1
+        outcomes: list[CallOutcome] = []
+        for arguments in inputs:
+            if self.call_pool is None:
+                self.call_pool = Pool(1)
+            try:
+                outcomes.append(self.call_pool.apply_async(call_worker_function, (self.run_count, code_data, name, arguments)).get(timeout))
+            except PoolTimeoutError:
+                self.close()
+                outcomes.append(CallOutcome(error=f"TimeoutError: the call did not return within {timeout} seconds"))
+            except Exception as e: # e.g. a return value that can not be pickled
+                outcomes.append(CallOutcome(error=f"{type(e).__name__}: {e}"))
+        return outcomes
+
+    def close(self) -> None:
+        # Stops the call process, a later run starts a new one
+        if self.call_pool is not None:
+            self.call_pool.terminate()
+            self.call_pool = None
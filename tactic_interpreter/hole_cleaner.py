@@ -1,33 +1,41 @@
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
 from typing import Any, Optional
 from tactic_interpreter.utility import UnexpectedValueError
-from tactic_interpreter.program import DescriptionStatement, CompositeStatement, EmptyStatement, FunctionDeclaration, FunctionType, PrimitiveType, Program, InjectedExpression, VariableDeclaration, ReturnStatement, Hole, Identifier
+from tactic_interpreter.program import Block, Edit, FillEdit, Function, Scope, SelectEdit, DescriptionStatement, CompositeStatement, EmptyStatement, FunctionDeclaration, FunctionType, PrimitiveType, Program, InjectedExpression, Statement, Type, VariableDeclaration, ReturnStatement, Hole, Identifier, invalidate_ancestors
+
+get_order = attrgetter("order")
+
+ORDER_GAP = 1 << 32 # the distance between the order keys of holes that are appended or relabelled
 
 class HoleCleaner:
     def __init__(self):
         self.selected_hole: Optional[Hole] = None
         self.holes: list[Hole] = []
+        self.function: Optional[Function] = None # the function of the holes collected by the current walk
+        self.scope: Optional[Scope] = None # the local variables at the current node of the walk
+        self.node_count = 0 # the number of nodes without types visited by the last walk
 
-    def clean_node(self, node: Any) -> Any:
+    def clean_node(self, node: Any, parent: Any) -> Any:
+        if not isinstance(node, Type):
+            self.node_count += 1
+        if isinstance(node, Statement):
+            node.parent = parent
+            node.render_cache = None
         match node:
             case Hole():
-                if node.filler is not None:
-                    if node is self.selected_hole:
-                        self.selected_hole = None
-                    return self.clean_node(node.filler)
-                if self.selected_hole is None:
-                    self.selected_hole = node
                 node.selected = False
-                node.index = len(self.holes)
+                node.parent = parent
+                node.function = self.function
+                node.scope = self.scope
                 self.holes.append(node)
                 return node
             case Identifier():
                 return node
             case PrimitiveType():
                 return node
-            case FunctionType(parameter_types, return_type):
-                parameter_types = [self.clean_node(parameter_type) for parameter_type in parameter_types]
-                return_type = self.clean_node(return_type)
-                return FunctionType(parameter_types, return_type)
+            case FunctionType():
+                return node
             case InjectedExpression():
                 return node
             case EmptyStatement():
@@ -35,33 +43,338 @@ class HoleCleaner:
             case DescriptionStatement():
                 return node
             case CompositeStatement(first, second):
-                first = self.clean_node(first)
-                second = self.clean_node(second)
-                return CompositeStatement(first, second)
+                node.first = self.clean_node(first, node)
+                node.second = self.clean_node(second, node)
+                return node
+            case Block(statements):
+                # Variables are visible to the holes of the following statements of the block
+                scope = self.scope
+                for index, statement in enumerate(statements):
+                    statements[index] = self.clean_node(statement, node)
+                    statement.slot_index = index
+                    if isinstance(statement, VariableDeclaration) and self.scope is not None:
+                        self.scope = self.scope.bind(statement.name.value, statement.type_)
+                self.scope = scope
+                return node
             case FunctionDeclaration(name, function_type, parameters, statement):
-                name = self.clean_node(name)
-                function_type = self.clean_node(function_type)
-                parameters = [self.clean_node(parameter) for parameter in parameters]
-                statement = self.clean_node(statement)
-                return FunctionDeclaration(name, function_type, parameters, statement)
+                node.name = self.clean_node(name, node)
+                node.function_type = self.clean_node(function_type, node)
+                node.parameters = [self.clean_node(parameter, node) for parameter in parameters]
+                for index, parameter in enumerate(node.parameters):
+                    if isinstance(parameter, Hole):
+                        parameter.slot_index = index
+                # Parameters are looked up in the declaration, such that introducing their names does not change any scope
+                scope = self.scope
+                self.scope = Scope()
+                node.statement = self.clean_node(statement, node)
+                self.scope = scope
+                return node
             case VariableDeclaration(name, type_, expression):
-                name = self.clean_node(name)
-                type_ = self.clean_node(type_)
-                expression = self.clean_node(expression)
-                return VariableDeclaration(name, type_, expression)
+                node.name = self.clean_node(name, node)
+                node.type_ = self.clean_node(type_, node)
+                node.expression = self.clean_node(expression, node)
+                return node
             case ReturnStatement(expression):
-                expression = self.clean_node(expression)
-                return ReturnStatement(expression)
+                node.value = self.clean_node(expression, node)
+                return node
             case _:
                 raise UnexpectedValueError(node)
 
-    def clean_holes(self, program: Program) -> None:
-        self.selected_hole = program.selected_hole
-        self.holes = []
-        program.statement = self.clean_node(program.statement)
-        if self.selected_hole is None and len(self.holes) > 0:
-            self.selected_hole = self.holes[-1]
-        if self.selected_hole is not None:
+    def get_position(self, function: Function, hole: Hole) -> int:
+        return bisect_left(function.holes, hole.order, key=get_order)
+
+    def order_holes(self, function: Function, position: int, count: int) -> None:
+        # Gives the count holes at the position order keys between those of their neighbours, such that the following holes keep their keys.
+        # If there is no room between the neighbours, all holes of the function are relabelled
+        holes = function.holes
+        end = position + count
+        lower = holes[position - 1].order if position > 0 else 0
+        step = ORDER_GAP
+        if end < len(holes):
+            upper = holes[end].order
+            if position == 0:
+                lower = upper - (count + 1) * ORDER_GAP
+            step = (upper - lower) // (count + 1)
+        if step == 0:
+            position, end, lower, step = 0, len(holes), 0, ORDER_GAP
+        for index in range(position, end):
+            lower += step
+            holes[index].order = lower
+
+    def register_holes(self, program: Program, holes: list[Hole]) -> None:
+        # Holes keep their identifier when they are restored by undoing or redoing an edit
+        for hole in holes:
+            if hole.id < 0:
+                hole.id = program.next_hole_id
+                program.next_hole_id += 1
+            program.hole_ids[hole.id] = hole
+
+    def unregister_holes(self, program: Program, holes: list[Hole]) -> None:
+        for hole in holes:
+            program.hole_ids.pop(hole.id, None)
+
+    def update_tactic_holes(self, function: Function, order: Optional[int], removed: list[Hole], added: list[Hole]) -> None:
+        # Replaces the removed holes, which start at the order key (or at the end for None), by the added holes in the tactic lists of the function.
+        # Must be called before the added holes are ordered, as ordering them may relabel the holes of the function
+        mask = 0
+        for hole in removed:
+            mask |= hole.tactics
+        for hole in added:
+            mask |= hole.tactics
+        while mask != 0:
+            tactic = mask & -mask # the lowest bit of the remaining tactics
+            mask ^= tactic
+            holes = function.tactic_holes.setdefault(tactic, [])
+            position = len(holes) if order is None else bisect_left(holes, order, key=get_order)
+            count = 0
+            for hole in removed:
+                count += hole.tactics & tactic != 0
+            holes[position:position + count] = [hole for hole in added if hole.tactics & tactic]
+
+    def find_tactic_hole(self, program: Program, hole: Hole, tactic: int, forward: bool) -> Optional[Hole]:
+        # Searches the function of the hole first, and then the other functions in the order of the module, wrapping around
+        function = hole.function
+        if function is None:
+            raise UnexpectedValueError(hole)
+        holes = function.tactic_holes.get(tactic, [])
+        if forward:
+            position = bisect_right(holes, hole.order, key=get_order)
+            if position < len(holes):
+                return holes[position]
+        else:
+            position = bisect_left(holes, hole.order, key=get_order)
+            if position > 0:
+                return holes[position - 1]
+        count = len(program.functions)
+        for offset in range(1, count + 1):
+            other = program.functions[(function.position + (offset if forward else -offset)) % count]
+            holes = other.tactic_holes.get(tactic, [])
+            if len(holes) > 0:
+                return holes[0] if forward else holes[-1]
+        return None
+
+    def find_hole(self, program: Program, function: Function, fallback_index: int) -> Optional[Hole]:
+        # Prefers the holes of the given function, and otherwise the function that is open for the longest time
+        if len(function.holes) > 0:
+            return function.holes[min(fallback_index, len(function.holes) - 1)]
+        return next((other.holes[0] for other in program.open_functions), None)
+
+    def track_function(self, program: Program, function: Function) -> None:
+        if len(function.holes) == 0:
+            program.open_functions.pop(function, None)
+        elif function not in program.open_functions:
+            program.open_functions[function] = None
+
+    def update_selection(self, program: Program, function: Optional[Function], fallback_index: int) -> None:
+        if self.selected_hole is None and function is not None:
+            self.selected_hole = self.find_hole(program, function, fallback_index)
+        if self.selected_hole is not None and not self.selected_hole.selected:
             self.selected_hole.selected = True
+            invalidate_ancestors(self.selected_hole)
         program.selected_hole = self.selected_hole
-        program.holes = self.holes
\ No newline at end of file
+
+    def add_function(self, program: Program) -> Function:
+        function = Function(position=len(program.functions))
+        program.functions.append(function)
+        self.function = function
+        return function
+
+    def register_declaration(self, program: Program, function: Function, declaration: FunctionDeclaration) -> None:
+        function.declaration = declaration
+        program.function_index[declaration.name.value] = function
+
+    def unregister_declaration(self, program: Program, function: Function) -> None:
+        if function.declaration is not None:
+            del program.function_index[function.declaration.name.value]
+            function.declaration = None
+
+    def clean_module(self, program: Program, module: Block) -> None:
+        # A function starts with its description or, if it has none, with its signature
+        module.parent = program
+        module.render_cache = None
+        self.node_count += 1
+        function: Optional[Function] = None
+        has_signature = False
+        for index, statement in enumerate(module.statements):
+            is_signature = isinstance(statement, (FunctionDeclaration, Hole))
+            if function is None or isinstance(statement, DescriptionStatement) or (is_signature and has_signature):
+                function = self.add_function(program)
+                has_signature = False
+            module.statements[index] = self.clean_node(statement, module)
+            statement.slot_index = index
+            has_signature = has_signature or is_signature
+            if isinstance(statement, FunctionDeclaration):
+                self.register_declaration(program, function, statement)
+            function.holes.extend(self.holes)
+            self.holes = []
+
+    def clean_holes(self, program: Program) -> None:
+        # Recollects all holes, keeping the selected hole if it is still part of the program and otherwise selecting the first hole
+        self.holes = []
+        self.function = None
+        self.scope = None
+        self.node_count = 0
+        program.functions = []
+        program.function_index = {}
+        program.open_functions = {}
+        program.stale_functions = {}
+        if isinstance(program.statement, Block):
+            self.clean_module(program, program.statement)
+        else:
+            self.add_function(program).holes = self.holes
+            program.statement = self.clean_node(program.statement, program)
+        program.size = self.node_count
+        program.hole_count = 0
+        # Holes keep their identifiers, e.g. when they were loaded from a checkpoint
+        program.hole_ids = {}
+        self.selected_hole = None
+        for function in program.functions:
+            program.hole_count += len(function.holes)
+            self.track_function(program, function)
+            if any(hole is program.selected_hole for hole in function.holes):
+                self.selected_hole = program.selected_hole
+            self.register_holes(program, function.holes)
+            self.update_tactic_holes(function, None, [], function.holes)
+            self.order_holes(function, 0, len(function.holes))
+            program.invalidate_indices(function, 0)
+        program.number_holes()
+        self.update_selection(program, program.functions[0] if len(program.functions) > 0 else None, 0)
+
+    def record_edit(self, program: Program, edit: Edit) -> None:
+        program.history.append(edit)
+        program.future.clear()
+
+    def change_selection(self, program: Program, hole: Optional[Hole]) -> None:
+        if program.selected_hole is not None:
+            program.selected_hole.selected = False
+            invalidate_ancestors(program.selected_hole)
+        self.selected_hole = hole
+        self.update_selection(program, None, 0)
+
+    def append_hole(self, program: Program, hole: Hole) -> None:
+        # Appends the hole of a new function to the module, where it can be filled like any other hole
+        module = program.statement
+        if not isinstance(module, Block):
+            raise UnexpectedValueError(module)
+        function = self.add_function(program)
+        hole.function = function
+        self.register_holes(program, [hole])
+        self.update_tactic_holes(function, None, [], [hole])
+        function.holes.append(hole)
+        self.order_holes(function, 0, 1)
+        program.invalidate_indices(function, 0)
+        program.splice_slot(module, ("statements", len(module.statements)), 0, [hole])
+
+    def splice_filler(self, program: Program, hole: Hole, filler: Any, appended: bool = False) -> FillEdit:
+        # Only the filler is walked, the rest of the program stays untouched
+        self.holes = []
+        self.function = hole.function
+        self.scope = hole.scope
+        self.node_count = 0
+        parent = hole.parent
+        filler = self.clean_node(filler, parent)
+        flattened = isinstance(filler, Block) and isinstance(parent, Block)
+        nodes = filler.statements if flattened else [filler]
+        slot = program.replace_node(hole, filler)
+        size_delta = self.node_count - (not appended) - flattened
+        program.size += size_delta
+        return FillEdit(hole, parent, slot, nodes, self.holes, size_delta, appended=appended)
+
+    def register_nodes(self, program: Program, edit: FillEdit) -> None:
+        # Signatures are only added at the top level of the module
+        for node in edit.nodes:
+            if isinstance(node, FunctionDeclaration) and edit.hole.function is not None:
+                self.register_declaration(program, edit.hole.function, node)
+
+    def update_holes(self, program: Program, edit: FillEdit) -> None:
+        # Replaces the filled hole by the holes of its filler, such that only the indices of the following holes of its function change
+        hole = edit.hole
+        function = hole.function
+        if function is None:
+            raise UnexpectedValueError(hole)
+        index = self.get_position(function, hole)
+        edit.selected_before = program.selected_hole
+        self.selected_hole = None if hole is program.selected_hole else program.selected_hole
+        if edit.appended and self.selected_hole is not None:
+            # The holes of a new function are selected instead
+            self.selected_hole.selected = False
+            invalidate_ancestors(self.selected_hole)
+            self.selected_hole = None
+        if len(edit.new_holes) > 0 and self.selected_hole is None:
+            self.selected_hole = edit.new_holes[0]
+        hole.selected = False
+        self.update_tactic_holes(function, hole.order, [hole], edit.new_holes)
+        function.holes[index:index + 1] = edit.new_holes
+        self.order_holes(function, index, len(edit.new_holes))
+        end = index + len(edit.new_holes)
+        edit.following = function.holes[end] if end < len(function.holes) else None
+        program.invalidate_indices(function, index)
+        program.hole_count += len(edit.new_holes) - (not edit.appended)
+        self.unregister_holes(program, [hole])
+        self.register_holes(program, edit.new_holes)
+        self.track_function(program, function)
+        self.register_nodes(program, edit)
+        self.update_selection(program, function, index)
+        edit.selected_after = program.selected_hole
+        self.record_edit(program, edit)
+
+    def fill_hole(self, program: Program, hole: Hole, filler: Any) -> None:
+        self.update_holes(program, self.splice_filler(program, hole, filler))
+
+    def select_hole(self, program: Program, hole: Hole) -> None:
+        edit = SelectEdit(program.selected_hole, hole)
+        self.change_selection(program, hole)
+        self.record_edit(program, edit)
+
+    def undo(self, program: Program) -> None:
+        # Edits are undone in reverse order, such that the program is in the same state as right after the edit
+        edit = program.history.pop()
+        if isinstance(edit, FillEdit):
+            function = edit.hole.function
+            if function is None:
+                raise UnexpectedValueError(edit.hole)
+            # The new holes or, if there are none, the hole that followed them locate the filled hole
+            following = edit.new_holes[0] if len(edit.new_holes) > 0 else edit.following
+            index = len(function.holes) if following is None else self.get_position(function, following)
+            restored = [] if edit.appended else [edit.hole]
+            if any(node is function.declaration for node in edit.nodes):
+                self.unregister_declaration(program, function)
+            program.splice_slot(edit.parent, edit.slot, len(edit.nodes), restored)
+            program.size -= edit.size_delta
+            self.update_tactic_holes(function, None if following is None else following.order, edit.new_holes, restored)
+            function.holes[index:index + len(edit.new_holes)] = restored
+            self.order_holes(function, index, len(restored))
+            program.invalidate_indices(function, index)
+            program.hole_count += len(restored) - len(edit.new_holes)
+            self.unregister_holes(program, edit.new_holes)
+            self.register_holes(program, restored)
+            self.track_function(program, function)
+            if edit.appended:
+                program.functions.pop()
+        self.change_selection(program, edit.selected_before)
+        program.future.append(edit)
+
+    def redo(self, program: Program) -> None:
+        edit = program.future.pop()
+        if isinstance(edit, FillEdit):
+            function = edit.hole.function
+            if function is None:
+                raise UnexpectedValueError(edit.hole)
+            index = 0 if edit.appended else self.get_position(function, edit.hole)
+            if edit.appended:
+                program.functions.append(function)
+            program.splice_slot(edit.parent, edit.slot, 0 if edit.appended else 1, edit.nodes)
+            edit.hole.parent = None
+            program.size += edit.size_delta
+            removed = [] if edit.appended else [edit.hole]
+            self.update_tactic_holes(function, None if edit.appended else edit.hole.order, removed, edit.new_holes)
+            function.holes[index:index + len(removed)] = edit.new_holes
+            self.order_holes(function, index, len(edit.new_holes))
+            program.invalidate_indices(function, index)
+            program.hole_count += len(edit.new_holes) - len(removed)
+            self.unregister_holes(program, removed)
+            self.register_holes(program, edit.new_holes)
+            self.track_function(program, function)
+            self.register_nodes(program, edit)
+        self.change_selection(program, edit.selected_after)
+        program.history.append(edit)
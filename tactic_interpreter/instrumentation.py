@@ -0,0 +1,113 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional, Sequence, TextIO
+import json
+import sys
+import time
+
+from tactic_interpreter.program import Program
+
+# The phases reported by the interpreter are "parse", "type_check", "fill", "clean_holes" and "print_program"
+
+class InterpreterHooks:
+    def on_tactic_start(self, tactic: str) -> None:
+        pass
+
+    def on_tactic_parsed(self, keyword: str, payload: Any) -> None:
+        pass
+
+    def on_phase_start(self, phase: str) -> None:
+        pass
+
+    def on_phase_end(self, phase: str) -> None:
+        pass
+
+    def on_tactic_end(self, status: str, error: Optional[str], program: Program) -> None:
+        pass
+
+class HookChain(InterpreterHooks):
+    # Forwards every event to several hooks, in order
+    def __init__(self, hooks: Sequence[InterpreterHooks]):
+        self.hooks = list(hooks)
+
+    def on_tactic_start(self, tactic: str) -> None:
+        for hooks in self.hooks:
+            hooks.on_tactic_start(tactic)
+
+    def on_tactic_parsed(self, keyword: str, payload: Any) -> None:
+        for hooks in self.hooks:
+            hooks.on_tactic_parsed(keyword, payload)
+
+    def on_phase_start(self, phase: str) -> None:
+        for hooks in self.hooks:
+            hooks.on_phase_start(phase)
+
+    def on_phase_end(self, phase: str) -> None:
+        for hooks in self.hooks:
+            hooks.on_phase_end(phase)
+
+    def on_tactic_end(self, status: str, error: Optional[str], program: Program) -> None:
+        for hooks in self.hooks:
+            hooks.on_tactic_end(status, error, program)
+
+@dataclass
+class PhaseRecord:
+    seconds: float = 0.0
+    allocated_blocks: int = 0 # the net number of memory blocks allocated during the phase
+
+@dataclass
+class TacticRecord:
+    number: int
+    keyword: str = "" # empty if the tactic was rejected before its arguments were parsed
+    status: str = ""
+    error: Optional[str] = None
+    seconds: float = 0.0
+    ast_size: int = 0
+    holes: int = 0
+    phases: dict[str, PhaseRecord] = field(default_factory=dict)
+
+class Profiler(InterpreterHooks):
+    def __init__(self, output: Optional[TextIO] = None):
+        self.output = output # if given, records are written as JSON lines instead of being kept in memory
+        self.records: list[TacticRecord] = []
+        self.record: Optional[TacticRecord] = None
+        self.tactic_count = 0
+        self.tactic_start = 0.0
+        self.phase_starts: list[tuple[float, int]] = []
+
+    def on_tactic_start(self, tactic: str) -> None:
+        self.tactic_count += 1
+        self.record = TacticRecord(self.tactic_count)
+        self.tactic_start = time.perf_counter()
+
+    def on_tactic_parsed(self, keyword: str, payload: Any) -> None:
+        if self.record is not None:
+            self.record.keyword = keyword
+
+    def on_phase_start(self, phase: str) -> None:
+        self.phase_starts.append((time.perf_counter(), sys.getallocatedblocks()))
+
+    def on_phase_end(self, phase: str) -> None:
+        start, start_blocks = self.phase_starts.pop()
+        if self.record is None:
+            return
+        phase_record = self.record.phases.setdefault(phase, PhaseRecord())
+        phase_record.seconds += time.perf_counter() - start
+        phase_record.allocated_blocks += sys.getallocatedblocks() - start_blocks
+
+    def on_tactic_end(self, status: str, error: Optional[str], program: Program) -> None:
+        if self.record is None:
+            return
+        self.record.seconds = time.perf_counter() - self.tactic_start
+        self.record.status = status
+        self.record.error = error
+        self.record.ast_size = program.size
+        self.record.holes = program.hole_count
+        if self.output is None:
+            self.records.append(self.record)
+        else:
+            self.output.write(json.dumps(asdict(self.record), separators=(",", ":")) + "\n")
+        self.record = None
+
+    def export(self, output: TextIO) -> None:
+        for record in self.records:
+            output.write(json.dumps(asdict(record), separators=(",", ":")) + "\n")
@@ -1,179 +1,429 @@
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Optional, TextIO, TypeVar
+import json
 
 from tactic_interpreter.parser import *
-from tactic_interpreter.program import DescriptionStatement, CompositeStatement, FunctionDeclaration, FunctionType, Hole, Program, ReturnStatement, VariableDeclaration
-from tactic_interpreter.utility import TerminationException, TacticError, UnexpectedValueError, pad_str
+from tactic_interpreter.program import Block, DescriptionStatement, Function, FunctionDeclaration, FunctionType, Hole, Identifier, InjectedExpression, Program, ReturnStatement, Type, VariableDeclaration
+from tactic_interpreter.utility import CheckpointError, TerminationException, TacticError, TraceError, UnexpectedValueError, pad_str
+from tactic_interpreter.checkpoint import load_checkpoint, save_checkpoint, statement_to_data
 from tactic_interpreter.hole_cleaner import HoleCleaner
-from tactic_interpreter.visualise import program_to_str
+from tactic_interpreter.instrumentation import InterpreterHooks
+from tactic_interpreter.tactics import DESCRIPTION, FILL, FINISH, INTRO, LET, REDO, RETURN, SIGNATURE, SWITCH, TACTIC_REGISTRY, UNDO
+from tactic_interpreter.trace import NOT_PARSED, read_trace
+from tactic_interpreter.type_checker import TypeChecker
+from tactic_interpreter.visualise import program_to_delta, program_to_lines
 
-TACTICS = {"description", "signature", "intro", "let", "return", "fill", "switch", "finish"}
+T = TypeVar("T")
+
+# The tactic masks of the holes of every kind
+DESCRIPTION_TACTICS = DESCRIPTION.mask
+SIGNATURE_TACTICS = SIGNATURE.mask
+INTRO_TACTICS = INTRO.mask
+STATEMENT_TACTICS = LET.mask | RETURN.mask
+EXPRESSION_TACTICS = FILL.mask
+
+# "full" prints the whole program after every tactic, "delta" only the lines that changed since the last printed program.
+# The JSON modes print one JSON event per line instead, with the program as rendered lines or as its serialized AST
+OUTPUT_MODES = ("full", "delta", "json", "json-ast")
+JSON_OUTPUT_MODES = frozenset({"json", "json-ast"})
+HISTORY_LIMIT = 100 # the number of tactics that can be undone, every undoable edit keeps its filled holes and their scopes alive
+
+@dataclass
+class TacticFailure:
+    number: int # the position of the tactic in the script, starting at 1
+    tactic: str
+    message: str
+
+@dataclass
+class InterpretationResult:
+    finished: bool
+    tactic_count: int
+    remaining_holes: int
+    program: str
+    failures: list[TacticFailure] = field(default_factory=list)
 
 class Interpreter:
-    def __init__(self):
-        self.program = Program(Hole({"description"}))
+    def __init__(self, quiet: bool = False, hooks: Optional[InterpreterHooks] = None, history_limit: Optional[int] = HISTORY_LIMIT, output: Optional[TextIO] = None, output_mode: str = "full"):
+        self.quiet = quiet # suppresses all output, such that only the returned results report the outcome
+        self.output = output # the stream to print to, or None for the standard output
+        self.output_mode = output_mode
+        self.printed_lines: Optional[list[str]] = None # the lines of the last printed program, usually the render cache of the program, see program_to_delta
+        self.hooks = hooks
+        self.finished = False
+        self.validate = True # whether accepted tactics are checked before they are applied, which is not needed when replaying a trace
+        self.program = Program(Hole(DESCRIPTION_TACTICS), history=deque(maxlen=history_limit))
         self.hole_cleaner = HoleCleaner()
+        self.type_checker = TypeChecker()
         self.hole_cleaner.clean_holes(self.program)
         self.print_program("Initial program")
 
-    def get_allowed_tactics(self) -> set[str]:
-        tactics: set[str] = set()
-        if len(self.program.holes) == 0:
-            tactics.update({"finish"})
-        if len(self.program.holes) > 1:
-            tactics.update({"switch"})
-        if self.program.selected_hole is not None:
-            tactics.update(self.program.selected_hole.tactics)
-        return tactics
+    def get_allowed_mask(self) -> int:
+        mask = 0 if self.program.selected_hole is None else self.program.selected_hole.tactics
+        if self.program.hole_count == 0:
+            mask |= FINISH.mask
+        if self.program.hole_count > 1:
+            mask |= SWITCH.mask
+        if self.can_add_function():
+            mask |= DESCRIPTION.mask
+        if len(self.program.history) > 0:
+            mask |= UNDO.mask
+        if len(self.program.future) > 0:
+            mask |= REDO.mask
+        return mask
+
+    def get_allowed_tactics(self) -> tuple[str, ...]:
+        return TACTIC_REGISTRY.get_names(self.get_allowed_mask())
+
+    def can_add_function(self) -> bool:
+        # New functions are appended to the module, once the selected function has a signature
+        if not isinstance(self.program.statement, Block):
+            return False
+        hole = self.program.selected_hole
+        return hole is None or hole.function is None or hole.function.declaration is not None
+
+    def get_function_name(self, function: Optional[Function]) -> Optional[str]:
+        if function is None or function.declaration is None:
+            return None
+        return function.declaration.name.value
+
+    def run_phase(self, phase: str, function: Callable[..., T], *args: Any) -> T:
+        if self.hooks is None:
+            return function(*args)
+        self.hooks.on_phase_start(phase)
+        try:
+            return function(*args)
+        finally:
+            self.hooks.on_phase_end(phase)
 
     def print_program(self, status: str, print_options: bool = True) -> None:
-        print(f"{status}:")
-        print(pad_str(program_to_str(self.program), "| "))
+        if self.quiet:
+            return
+        self.run_phase("print_program", self.write_program, status, print_options)
+
+    def write_event(self, event: dict[str, Any]) -> None:
+        # Events are flushed, such that clients reading from a pipe receive them right away
+        print(json.dumps(event, separators=(",", ":")), file=self.output, flush=True)
+
+    def get_program_event(self, status: str) -> dict[str, Any]:
+        self.program.number_holes()
+        return {
+            "event": "program",
+            "status": status,
+            "finished": self.finished,
+            "selected": None if self.program.selected_hole is None else self.program.selected_hole.index,
+            "selected_id": None if self.program.selected_hole is None else self.program.selected_hole.id,
+            "function": None if self.program.selected_hole is None else self.get_function_name(self.program.selected_hole.function),
+            # The indices of holes are only unique within their function, functions without a signature have no name
+            "holes": [
+                {"function": self.get_function_name(function), "index": hole.index, "id": hole.id, "tactics": sorted(TACTIC_REGISTRY.get_names(hole.tactics))}
+                for function in self.program.functions
+                for hole in function.holes
+            ],
+            "options": [] if self.finished else sorted(self.get_allowed_tactics()),
+            # The holes of the serialized AST are in the order of their indices
+            "program": statement_to_data(self.program.statement) if self.output_mode == "json-ast" else program_to_lines(self.program),
+        }
+
+    def print_error(self, tactic: str, message: str) -> None:
+        if self.quiet:
+            return
+        if self.output_mode in JSON_OUTPUT_MODES:
+            self.write_event({"event": "error", "tactic": tactic, "message": message})
+        else:
+            print(f"Error: {message}", file=self.output)
+
+    def write_program(self, status: str, print_options: bool) -> None:
+        if self.output_mode in JSON_OUTPUT_MODES:
+            self.write_event(self.get_program_event(status))
+            return
+        print(f"{status}:", file=self.output)
+        match self.output_mode:
+            case "full":
+                print("\n".join(program_to_lines(self.program, "| ")), file=self.output)
+            case "delta":
+                lines, delta = program_to_delta(self.program, self.printed_lines, "| ")
+                if self.printed_lines is None:
+                    print("\n".join(lines), file=self.output)
+                elif len(delta) > 0:
+                    print("\n".join(delta), file=self.output)
+                self.printed_lines = lines
+            case _:
+                raise UnexpectedValueError(self.output_mode)
         if print_options:
             tactics = self.get_allowed_tactics()
             tactics_str = ", ".join(tactics) if len(tactics) > 0 else "None"
-            print(pad_str(f"Options: {tactics_str}", "| "))
+            print(pad_str(f"Options: {tactics_str}", "| "), file=self.output)
 
     def get_selected_hole(self) -> Hole:
         if self.program.selected_hole is None:
             raise TacticError(f"No hole is selected")
         return self.program.selected_hole
 
+    def fill_hole(self, hole: Hole, filler: Any, appended: bool = False) -> None:
+        edit = self.run_phase("fill", self.hole_cleaner.splice_filler, self.program, hole, filler, appended)
+        self.run_phase("clean_holes", self.hole_cleaner.update_holes, self.program, edit)
+
     def fill_selected_hole(self, filler: Any) -> None:
-        self.get_selected_hole().filler = filler
-        self.hole_cleaner.clean_holes(self.program)
+        self.fill_hole(self.get_selected_hole(), filler)
 
-    def select_hole(self, index: int) -> None:
-        if index < 0 or index >= len(self.program.holes):
-            raise TacticError(f"There is no unfilled hole with the index {index!r}")
-        if self.program.selected_hole is self.program.holes[index]:
+    def add_function(self, filler: Any) -> None:
+        hole = Hole(DESCRIPTION_TACTICS)
+        self.hole_cleaner.append_hole(self.program, hole)
+        self.fill_hole(hole, filler, True)
+
+    def select_hole(self, hole: Hole) -> None:
+        selected_function = self.get_selected_hole().function
+        if hole.function is not selected_function and selected_function is not None and selected_function.declaration is None:
+            # A function without a signature can not be left, as it could not be switched back to by name
+            raise TacticError(f"The selected function needs a signature before switching to another function")
+        if self.program.selected_hole is hole:
             raise TacticError(f"Hole is already selected")
-        self.program.selected_hole = self.program.holes[index]
-        self.hole_cleaner.clean_holes(self.program)
+        self.hole_cleaner.select_hole(self.program, hole)
+
+    def select_hole_by_index(self, name: Optional[Identifier], index: int) -> None:
+        if name is None:
+            function = self.get_selected_hole().function
+        elif name.value in self.program.function_index:
+            function = self.program.function_index[name.value]
+        else:
+            raise TacticError(f"There is no function named {name.value!r}")
+        if function is None:
+            raise UnexpectedValueError(self.program.selected_hole)
+        if index < 0 or index >= len(function.holes):
+            raise TacticError(f"There is no unfilled hole with the index {index!r}")
+        self.select_hole(function.holes[index])
+
+    def select_hole_by_id(self, hole_id: int) -> None:
+        if hole_id not in self.program.hole_ids:
+            raise TacticError(f"There is no unfilled hole with the identifier {hole_id!r}")
+        self.select_hole(self.program.hole_ids[hole_id])
+
+    def select_tactic_hole(self, name: str, forward: bool) -> None:
+        tactic = TACTIC_REGISTRY.get(name)
+        if tactic is None:
+            raise TacticError(f"Unknown tactic {name!r}")
+        hole = self.hole_cleaner.find_tactic_hole(self.program, self.get_selected_hole(), tactic.mask, forward)
+        if hole is None or hole is self.program.selected_hole:
+            raise TacticError(f"There is no other unfilled hole for the tactic {name!r}")
+        self.select_hole(hole)
 
     def interprete_tactic(self, tactic: str) -> None:
-        if tactic.strip() == "":
-            raise TacticError(f"No tactic specified")
-        if ":" not in tactic:
-            raise TacticError(f"Missing {":"!r} after tactic keyword")
-        keyword, data = tactic.split(":", 1)
-        keyword = keyword.strip()
-        if keyword not in TACTICS:
+        if self.hooks is None:
+            return self.execute_tactic(tactic)
+        self.hooks.on_tactic_start(tactic)
+        try:
+            self.execute_tactic(tactic)
+        except TacticError as e:
+            self.hooks.on_tactic_end("error", str(e), self.program)
+            raise
+        except TerminationException:
+            self.hooks.on_tactic_end("finished", None, self.program)
+            raise
+        self.hooks.on_tactic_end("ok", None, self.program)
+
+    def execute_tactic(self, tactic: str) -> None:
+        keyword, data = split_tactic(tactic)
+        registered = TACTIC_REGISTRY.get(keyword)
+        if registered is None:
             raise TacticError(f"Unknown tactic {keyword!r}")
-        if keyword not in self.get_allowed_tactics():
+        if not self.get_allowed_mask() & registered.mask:
             raise TacticError(f"The tactic {keyword!r} can not be applied right now")
-        match keyword:
-            case "description":
-                if data.strip() == "":
-                    raise TacticError(f"No description specified")
-                description = data.strip()
-                self.fill_selected_hole(
-                    CompositeStatement(
-                        DescriptionStatement(description),
-                        Hole({"signature"})
-                    )
-                )
-                self.print_program(f"Added description")
-            case "signature":
-                if data.strip() == "":
-                    raise TacticError(f"No signature name specified")
-                if ":" not in data:
-                    raise TacticError(f"Missing {":"!r} after signature name")
-                name, function_type_str = data.split(":", 1)
-                identifier = parse_identifier(name)
-                if function_type_str == "":
-                    raise TacticError(f"No function type specified")
-                function_type: FunctionType = parse_type(function_type_str) # type:ignore
-                if not isinstance(function_type, FunctionType):
-                    raise TacticError(f"Only function types are allowed for the signature")
-                self.fill_selected_hole(
-                    FunctionDeclaration(
-                        identifier,
-                        function_type,
-                        [Hole({"intro"}) for _ in function_type.parameter_types],
-                        Hole({"let", "return"})
-                    )
-                )
-                self.print_program(f"Added signature")
-            case "intro":
-                if data.strip() == "":
-                    raise TacticError(f"No variable names specified")
-                identifier = parse_identifier(data)
-                self.fill_selected_hole(identifier)
-                self.print_program(f"Introduced name")
-            case "let":
-                if data.strip() == "":
-                    raise TacticError(f"No variable name specified")
-                if ":" not in data:
-                    raise TacticError(f"Missing {":"!r} after variable name")
-                name, type_str = data.split(":", 1)
-                name = parse_identifier(name)
-                if type_str == "":
-                    raise TacticError(f"No variable type specified")
-                type_ = parse_type(type_str)
-                self.fill_selected_hole(
-                    CompositeStatement(
-                        VariableDeclaration(
-                            name,
-                            type_,
-                            Hole({"fill"})
-                        ),
-                        Hole(self.get_selected_hole().tactics)
-                    )
-                )
-                self.print_program(f"Added variable declaration")
-            case "fill":
-                if data.strip() == "":
-                    raise TacticError(f"No expression specified")
-                expression = parse_expression(data.strip())
-                self.fill_selected_hole(expression)
-                self.print_program(f"Added expression")
-            case "return":
-                self.fill_selected_hole(ReturnStatement(Hole({"fill"})))
-                self.print_program(f"Added return statement")
-            case "switch":
-                if data.strip() == "":
-                    raise TacticError(f"No index specified")
-                index = parse_integer(data)
-                self.select_hole(index)
-                self.print_program(f"Switched hole")
-            case "finish":
-                if len(self.program.holes) > 0:
-                    raise TacticError(f"There are still unfilled holes")
-                self.print_program(f"Finished the program", False)
-                raise TerminationException
+        payload = self.run_phase("parse", registered.parse, data)
+        if self.hooks is not None:
+            self.hooks.on_tactic_parsed(keyword, payload)
+        self.apply_tactic(keyword, payload)
+
+    def apply_tactic(self, keyword: str, payload: Any) -> None:
+        getattr(self, TACTIC_REGISTRY.tactics[keyword].handler)(payload)
+
+    def apply_description(self, payload: str) -> None:
+        filler = Block([
+            DescriptionStatement(payload),
+            Hole(SIGNATURE_TACTICS)
+        ])
+        if self.program.selected_hole is not None and self.program.selected_hole.tactics & DESCRIPTION_TACTICS:
+            self.fill_selected_hole(filler)
+        else:
+            self.add_function(filler)
+        self.print_program(f"Added description")
+
+    def apply_signature(self, payload: tuple[Identifier, FunctionType]) -> None:
+        identifier, function_type = payload
+        if identifier.value in self.program.function_index:
+            raise TacticError(f"There is already a function named {identifier.value!r}")
+        self.fill_selected_hole(
+            FunctionDeclaration(
+                identifier,
+                function_type,
+                [Hole(INTRO_TACTICS) for _ in function_type.parameter_types],
+                Block([Hole(STATEMENT_TACTICS)])
+            )
+        )
+        self.print_program(f"Added signature")
+
+    def apply_intro(self, payload: Identifier) -> None:
+        self.fill_selected_hole(payload)
+        self.print_program(f"Introduced name")
+
+    def apply_let(self, payload: tuple[Identifier, Type]) -> None:
+        identifier, type_ = payload
+        self.fill_selected_hole(
+            Block([
+                VariableDeclaration(
+                    identifier,
+                    type_,
+                    Hole(EXPRESSION_TACTICS)
+                ),
+                Hole(self.get_selected_hole().tactics)
+            ])
+        )
+        self.print_program(f"Added variable declaration")
+
+    def apply_fill(self, payload: InjectedExpression) -> None:
+        if self.validate:
+            self.run_phase("type_check", self.type_checker.check_fill, self.program, self.get_selected_hole(), payload)
+        self.fill_selected_hole(payload)
+        self.print_program(f"Added expression")
+
+    def apply_return(self, payload: None) -> None:
+        self.fill_selected_hole(ReturnStatement(Hole(EXPRESSION_TACTICS)))
+        self.print_program(f"Added return statement")
+
+    def apply_switch(self, payload: tuple[Any, ...]) -> None:
+        match payload:
+            case ("index", name, index):
+                self.select_hole_by_index(name, index)
+            case ("id", hole_id):
+                self.select_hole_by_id(hole_id)
+            case ("next" | "previous" as direction, tactic):
+                self.select_tactic_hole(tactic, direction == "next")
             case _:
-                raise UnexpectedValueError(keyword)
-        
-    def interprete_file(self, file_path: str | Path) -> None:
+                raise UnexpectedValueError(payload)
+        self.print_program(f"Switched hole")
+
+    def apply_undo(self, payload: None) -> None:
+        self.run_phase("fill", self.hole_cleaner.undo, self.program)
+        self.print_program(f"Undid tactic")
+
+    def apply_redo(self, payload: None) -> None:
+        self.run_phase("fill", self.hole_cleaner.redo, self.program)
+        self.print_program(f"Redid tactic")
+
+    def apply_finish(self, payload: None) -> None:
+        if self.program.hole_count > 0:
+            raise TacticError(f"There are still unfilled holes")
+        self.finished = True
+        self.print_program(f"Finished the program", False)
+        raise TerminationException
+
+    def save_checkpoint(self, path: str | Path) -> None:
+        # The history of edits is not part of the checkpoint
+        save_checkpoint(path, self.program, self.finished)
+
+    def load_checkpoint(self, path: str | Path) -> None:
+        program, selected, finished = load_checkpoint(path)
+        program.history = deque(maxlen=self.program.history.maxlen)
+        self.hole_cleaner.clean_holes(program)
+        if selected is not None:
+            position, index = selected
+            if position < 0 or position >= len(program.functions) or index < 0 or index >= len(program.functions[position].holes):
+                raise CheckpointError(f"There is no unfilled hole with the index {index!r} in the function at position {position!r}")
+            self.hole_cleaner.change_selection(program, program.functions[position].holes[index])
+        self.program = program
+        self.finished = finished
+        self.printed_lines = None
+
+    def get_result(self, tactic_count: int, failures: list[TacticFailure]) -> InterpretationResult:
+        return InterpretationResult(
+            self.finished,
+            tactic_count,
+            self.program.hole_count,
+            "\n".join(program_to_lines(self.program)),
+            failures
+        )
+
+    def interprete_file(self, file_path: str | Path) -> InterpretationResult:
         file_path = Path(file_path)
         if not file_path.is_file():
             raise FileNotFoundError("File not found")
-        tactics = file_path.read_text()
-        for tactic in tactics.split("\n\n"):
-            print(f"\nInput a tactic:")
-            print(f"{pad_str(tactic + "\n", "| ")}\n")
+        with file_path.open() as stream:
+            return self.interprete_stream(stream)
+
+    def interprete_stream(self, stream: TextIO) -> InterpretationResult:
+        failures: list[TacticFailure] = []
+        tactic_count = 0
+        for tactic in read_tactics(stream):
+            tactic_count += 1
+            if not self.quiet and self.output_mode not in JSON_OUTPUT_MODES:
+                print(f"\nInput a tactic:", file=self.output)
+                print(f"{pad_str(tactic + "\n", "| ")}\n", file=self.output)
             try:
                 self.interprete_tactic(tactic)
             except TacticError as e:
-                print(f"Error: {e}")
+                self.print_error(tactic, str(e))
+                failures.append(TacticFailure(tactic_count, tactic, str(e)))
             except TerminationException:
-                return None
+                break
+        return self.get_result(tactic_count, failures)
     
+    def replay_stream(self, stream: TextIO) -> InterpretationResult:
+        # Accepted tactics are applied with their recorded payloads, without parsing, validating or printing them.
+        # Rejected tactics did not change the program and are only reported as failures
+        failures: list[TacticFailure] = []
+        tactic_count = 0
+        quiet = self.quiet
+        self.quiet = True
+        self.validate = False
+        try:
+            for record in read_trace(stream):
+                tactic_count += 1
+                if record.status == "error":
+                    failures.append(TacticFailure(tactic_count, record.tactic, record.error or ""))
+                    continue
+                if record.keyword is None or record.payload is NOT_PARSED:
+                    raise TraceError(f"Tactic {tactic_count} of the trace has no payload")
+                registered = TACTIC_REGISTRY.get(record.keyword)
+                if registered is None:
+                    raise TraceError(f"Tactic {tactic_count} of the trace has the unknown keyword {record.keyword!r}")
+                # The payloads are not validated, but the tactics must still be allowed, e.g. a trace recorded after resuming a checkpoint
+                # can not be replayed on a new program
+                if not self.get_allowed_mask() & registered.mask:
+                    raise TraceError(f"Tactic {tactic_count} of the trace can not be applied right now: {record.keyword!r}")
+                try:
+                    self.apply_tactic(record.keyword, record.payload)
+                except (TacticError, UnexpectedValueError) as e:
+                    raise TraceError(f"Tactic {tactic_count} of the trace can not be replayed: {e}")
+                except TerminationException:
+                    break
+        finally:
+            self.quiet = quiet
+            self.validate = True
+        return self.get_result(tactic_count, failures)
+
+    def replay_file(self, file_path: str | Path) -> InterpretationResult:
+        with Path(file_path).open() as stream:
+            return self.replay_stream(stream)
+
     def interprete_interactive(self) -> None:
+        # Prompts are left out of the JSON modes, such that every printed line is an event
+        prompts = self.output_mode not in JSON_OUTPUT_MODES
         while True:
             tactic_lines = []
-            print(f"\nInput a tactic:")
+            if prompts:
+                print(f"\nInput a tactic:", file=self.output)
             while True:
-                tactic_line = input("| ")
+                tactic_line = input("| " if prompts else "")
                 if tactic_line == "":
-                    print()
+                    if prompts:
+                        print(file=self.output)
                     break
                 tactic_lines.append(tactic_line)
             tactic = "\n".join(tactic_lines)
             try:
                 self.interprete_tactic(tactic)
             except TacticError as e:
-                print(f"Error: {e}")
+                self.print_error(tactic, str(e))
             except TerminationException:
                 return None
\ No newline at end of file
@@ -1,7 +1,8 @@
 import ast
 import re
 from dataclasses import dataclass
-from typing import Any, Optional
+from functools import lru_cache
+from typing import Any, Iterator, Optional, TextIO
 
 from tactic_interpreter.program import Expression, FunctionType, Identifier, InjectedExpression, PrimitiveType, Type
 from tactic_interpreter.utility import TacticError
@@ -31,6 +32,8 @@ TOKEN_REGEX = re.compile(
 
 PRIMITIVES = {"bool", "int", "float", "complex", "str"}
 
+PARSER_CACHE_SIZE = 4096 # the number of results that are cached per parser function
+
 def lex_type(type_str: str) -> list[Token]:
     tokens: list[Token] = []
     pos = 0
@@ -111,11 +114,12 @@ def parse_type_tokens(stream: TokenStream) -> Type:
     if stream.peek() is not None and stream.peek().kind == "->": # type:ignore
         stream.consume("->")
         right = parse_type_tokens(stream)
-        return FunctionType(left, right)
+        return FunctionType(tuple(left), right)
     if len(left) != 1:
         raise TacticError("Unexpected tuple type")
     return left[0]
 
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
 def parse_type(type_str: str) -> Type:
     tokens = lex_type(type_str)
     stream = TokenStream(tokens)
@@ -124,15 +128,29 @@ def parse_type(type_str: str) -> Type:
         raise TacticError(f"Unexpected trailing tokens")
     return result
     
-def parse_expression(expression_str: str) -> Expression:
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
+def parse_expression_tree(expression_str: str) -> Optional[ast.expr]:
+    # The returned tree is shared with the type checker and must not be modified.
+    # Like before type checking, any code is accepted, but only single expressions have a tree
     expression_str = expression_str.strip()
     try:
-        ast.parse(expression_str)
-        return InjectedExpression(expression_str)
+        match ast.parse(expression_str).body:
+            case [ast.Expr(value)]:
+                return value
+        return None
     except SyntaxError:
         pass
+    except RecursionError:
+        raise TacticError(f"The expression is nested too deeply")
     raise TacticError(f"Invalid expression {expression_str!r}")
 
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
+def parse_expression(expression_str: str) -> Expression:
+    expression_str = expression_str.strip()
+    parse_expression_tree(expression_str)
+    return InjectedExpression(expression_str)
+
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
 def parse_identifier(identifier_str: str) -> Identifier:
     identifier_str = identifier_str.strip()
     try:
@@ -143,6 +161,7 @@ def parse_identifier(identifier_str: str) -> Identifier:
         pass
     raise TacticError(f"Invalid identifier {identifier_str!r}")
 
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
 def parse_integer(integer_str: str) -> int:
     integer_str = integer_str.strip()
     try:
@@ -151,4 +170,103 @@ def parse_integer(integer_str: str) -> int:
                 return value
     except SyntaxError:
         pass
-    raise TacticError(f"Invalid integer {integer_str!r}")
\ No newline at end of file
+    raise TacticError(f"Invalid integer {integer_str!r}")
+
+def split_tactic(tactic: str) -> tuple[str, str]:
+    if tactic.strip() == "":
+        raise TacticError(f"No tactic specified")
+    if ":" not in tactic:
+        raise TacticError(f"Missing {":"!r} after tactic keyword")
+    keyword, data = tactic.split(":", 1)
+    return keyword.strip(), data
+
+# The parsers of the data after the keyword of every tactic, which are registered with the tactics
+
+def parse_description_data(data: str) -> str:
+    if data.strip() == "":
+        raise TacticError(f"No description specified")
+    return data.strip()
+
+def parse_signature_data(data: str) -> tuple[Identifier, FunctionType]:
+    if data.strip() == "":
+        raise TacticError(f"No signature name specified")
+    if ":" not in data:
+        raise TacticError(f"Missing {":"!r} after signature name")
+    name, function_type_str = data.split(":", 1)
+    identifier = parse_identifier(name)
+    if function_type_str == "":
+        raise TacticError(f"No function type specified")
+    function_type = parse_type(function_type_str)
+    if not isinstance(function_type, FunctionType):
+        raise TacticError(f"Only function types are allowed for the signature")
+    return identifier, function_type
+
+def parse_intro_data(data: str) -> Identifier:
+    if data.strip() == "":
+        raise TacticError(f"No variable names specified")
+    return parse_identifier(data)
+
+def parse_let_data(data: str) -> tuple[Identifier, Type]:
+    if data.strip() == "":
+        raise TacticError(f"No variable name specified")
+    if ":" not in data:
+        raise TacticError(f"Missing {":"!r} after variable name")
+    name, type_str = data.split(":", 1)
+    identifier = parse_identifier(name)
+    if type_str == "":
+        raise TacticError(f"No variable type specified")
+    return identifier, parse_type(type_str)
+
+def parse_fill_data(data: str) -> Expression:
+    if data.strip() == "":
+        raise TacticError(f"No expression specified")
+    return parse_expression(data.strip())
+
+def parse_switch_data(data: str) -> tuple[Any, ...]:
+    # Either the index of a hole of the selected function, the name of a function followed by the index of one of its holes,
+    # the identifier of a hole prefixed by "#", or "next" or "previous" followed by a tactic of the hole
+    parts = data.split()
+    if len(parts) == 0:
+        raise TacticError(f"No index specified")
+    if len(parts) > 2:
+        raise TacticError(f"Invalid hole {data.strip()!r}")
+    if len(parts) == 1 and parts[0].startswith("#"):
+        return "id", parse_integer(parts[0][1:])
+    if len(parts) == 2 and parts[0] in ("next", "previous") and not parts[1].isdigit():
+        return parts[0], parse_identifier(parts[1]).value
+    if len(parts) == 2:
+        return "index", parse_identifier(parts[0]), parse_integer(parts[1])
+    return "index", None, parse_integer(parts[0])
+
+def parse_no_data(data: str) -> None:
+    # The data of tactics without arguments is ignored
+    return None
+
+def parser_cache_info() -> dict[str, Any]:
+    return {
+        "parse_type": parse_type.cache_info(),
+        "parse_expression": parse_expression.cache_info(),
+        "parse_expression_tree": parse_expression_tree.cache_info(),
+        "parse_identifier": parse_identifier.cache_info(),
+        "parse_integer": parse_integer.cache_info(),
+    }
+
+def clear_parser_caches() -> None:
+    parse_type.cache_clear()
+    parse_expression.cache_clear()
+    parse_expression_tree.cache_clear()
+    parse_identifier.cache_clear()
+    parse_integer.cache_clear()
+
+def read_tactics(stream: TextIO) -> Iterator[str]:
+    # Yields the same tactics as stream.read().split("\n\n"), but only buffers the current tactic
+    buffer = ""
+    for line in stream:
+        # The buffer contained no separator before the line, so a new one starts at the earliest at its last character
+        start = max(0, len(buffer) - 1)
+        buffer += line
+        while (end := buffer.find("\n\n", start)) != -1:
+            yield buffer[:end]
+            buffer = buffer[end + 2:]
+            start = 0
+    yield buffer
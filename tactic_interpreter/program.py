@@ -1,74 +1,278 @@
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Any, Literal, Optional, Sequence
+from typing import Any, ClassVar, Literal, Optional, Sequence
+from weakref import WeakValueDictionary
 
-@dataclass
+from tactic_interpreter.utility import UnexpectedValueError
+
+# Nodes use slots to keep the per-node footprint small
+
+@dataclass(slots=True)
 class Hole:
-    tactics: set[str] # the set of tactics that can be applied to that hole
+    tactics: int # the bit mask of the tactics that can be applied to that hole, see TacticRegistry
     selected: bool = False
-    index: int = 0
-    filler: Optional[Any] = None
+    index: int = 0 # the index of the hole in the holes of its function, updated before it is shown (see Program.number_holes)
+    order: int = field(default=0, kw_only=True, repr=False, compare=False) # orders the holes of a function without renumbering them, see HoleCleaner.order_holes
+    slot_index: int = field(default=-1, kw_only=True, repr=False, compare=False) # the index of the hole in the list field of its parent, checked before use as splicing a block moves its later statements
+    id: int = field(default=-1, kw_only=True, compare=False) # the identifier of the hole, which stays the same until it is filled, or -1 if it was not registered yet
+    parent: Optional[Any] = field(default=None, kw_only=True, repr=False, compare=False)
+    function: Optional["Function"] = field(default=None, kw_only=True, repr=False, compare=False)
+    scope: Optional["Scope"] = field(default=None, kw_only=True, repr=False, compare=False) # the local variables visible at the hole, None outside of function bodies
 
-@dataclass
+# Types, identifiers and expressions are immutable, such that parsed values can be shared between nodes.
+# Types are additionally hash-consed: structurally equal types are the same object, such that equality and hashing are by identity
+
+@dataclass(frozen=True, eq=False, init=False, slots=True, weakref_slot=True)
 class Type:
     pass
 
-@dataclass
+@dataclass(frozen=True, eq=False, init=False, slots=True, weakref_slot=True)
 class PrimitiveType(Type):
     value: Literal["bool", "int", "float", "complex", "str"]
 
-@dataclass
+    _instances: ClassVar[WeakValueDictionary[str, "PrimitiveType"]] = WeakValueDictionary()
+
+    def __new__(cls, value: Literal["bool", "int", "float", "complex", "str"]) -> "PrimitiveType":
+        instance = cls._instances.get(value)
+        if instance is None:
+            instance = object.__new__(cls)
+            object.__setattr__(instance, "value", value)
+            instance = cls._instances.setdefault(value, instance)
+        return instance
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (PrimitiveType, (self.value,))
+
+@dataclass(frozen=True, eq=False, init=False, slots=True, weakref_slot=True)
 class FunctionType(Type):
-    parameter_types: list[Type]
+    parameter_types: tuple[Type, ...]
     return_type: Type
 
-@dataclass
+    _instances: ClassVar[WeakValueDictionary[tuple[tuple[Type, ...], Type], "FunctionType"]] = WeakValueDictionary()
+
+    def __new__(cls, parameter_types: Sequence[Type], return_type: Type) -> "FunctionType":
+        key = (tuple(parameter_types), return_type)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = object.__new__(cls)
+            object.__setattr__(instance, "parameter_types", key[0])
+            object.__setattr__(instance, "return_type", return_type)
+            instance = cls._instances.setdefault(key, instance)
+        return instance
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (FunctionType, (self.parameter_types, self.return_type))
+
+@dataclass(frozen=True, eq=False, slots=True)
+class Scope:
+    # The types of local variables, which is persistent, such that every hole keeps the scope in which it was created.
+    # Like the digits of a binary counter, the variables are stored in tables of power of two sizes, newest first,
+    # such that binding a variable copies amortized O(log n) variables and a lookup checks O(log n) tables
+    tables: tuple[tuple[int, dict[str, Type]], ...] = ()
+
+    def bind(self, name: str, type_: Type) -> "Scope":
+        size = 1
+        variables = {name: type_}
+        tables = self.tables
+        while len(tables) > 0 and tables[0][0] == size:
+            size += tables[0][0]
+            variables = tables[0][1] | variables
+            tables = tables[1:]
+        return Scope(((size, variables),) + tables)
+
+    def lookup(self, name: str) -> Optional[Type]:
+        for _, variables in self.tables:
+            if name in variables:
+                return variables[name]
+        return None
+
+@dataclass(frozen=True, slots=True)
 class Identifier:
     value: str
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Expression:
     pass
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class InjectedExpression(Expression):
     value: str
 
-@dataclass
+@dataclass(slots=True, eq=False)
+class RenderCache:
+    prefix: str
+    lines: list[str] # the changes are spliced into the lines when they are rendered
+    changes: Optional[list[Any]] = None # the changes of the children since the lines were rendered, see invalidate_node
+    counts: Optional[list[int]] = None # the number of lines of every child of a block or composite statement
+    offsets: Optional[list[int]] = None # the first lines of the leading children of a block, extended on demand
+
+@dataclass(slots=True)
 class Statement:
-    pass
+    parent: Optional[Any] = field(default=None, kw_only=True, repr=False, compare=False)
+    render_cache: Optional[RenderCache] = field(default=None, kw_only=True, repr=False, compare=False)
+    slot_index: int = field(default=-1, kw_only=True, repr=False, compare=False) # like Hole.slot_index
 
-@dataclass
+@dataclass(slots=True)
 class EmptyStatement(Statement):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class DescriptionStatement(Statement):
     value: str
 
-@dataclass
+@dataclass(slots=True)
 class CompositeStatement(Statement):
     first: Statement
     second: Statement | Hole
 
-@dataclass
+@dataclass(slots=True)
+class Block(Statement):
+    statements: list[Statement | Hole]
+
+@dataclass(slots=True)
 class FunctionDeclaration(Statement):
     name: Identifier
     function_type: FunctionType
     parameters: Sequence[Identifier | Hole]
     statement: Statement | Hole
 
-@dataclass
+@dataclass(slots=True)
 class VariableDeclaration(Statement):
     name: Identifier
     type_: Type
     expression: Expression | Hole
 
-@dataclass
+@dataclass(slots=True)
 class ReturnStatement(Statement):
     value: Expression | Hole
 
-@dataclass
+@dataclass(slots=True, eq=False)
+class Function:
+    # A top-level function of the module, whose holes are numbered and maintained independently of the other functions
+    holes: list[Hole] = field(default_factory=list)
+    declaration: Optional[FunctionDeclaration] = None # None until the signature of the function was added
+    position: int = 0 # the position of the function in the module
+    tactic_holes: dict[int, list[Hole]] = field(default_factory=dict) # the holes to which each tactic can be applied by the bit of the tactic, in the order of their indices
+    numbered: int = 0 # the number of leading holes whose index is up to date
+
+Slot = tuple[str, int] # the field of a parent and the index inside of that field, or -1 for fields that are not lists
+
+# Edits record the changes of the program, such that they can be reverted without copying the program
+
+@dataclass(slots=True)
+class FillEdit:
+    hole: Hole
+    parent: Any
+    slot: Slot
+    nodes: Sequence[Any] # the nodes that replaced the hole in the slot of the parent
+    new_holes: list[Hole]
+    size_delta: int
+    selected_before: Optional[Hole] = None
+    selected_after: Optional[Hole] = None
+    appended: bool = False # whether the hole was appended to the module for a new function, such that undoing the edit removes the hole as well
+    following: Optional[Hole] = None # the hole of the function that followed the new holes, which locates the filled hole when undoing an edit without new holes
+
+@dataclass(slots=True)
+class SelectEdit:
+    selected_before: Optional[Hole]
+    selected_after: Optional[Hole]
+
+Edit = FillEdit | SelectEdit
+
+@dataclass(slots=True)
 class Program:
-    statement: Statement | Hole  # Not list[Statement | Hole] such that hole filling only spawns holes inside the filled hole
+    statement: Statement | Hole  # Holes inside of a block are filled by splicing the filler into the block, such that hole filling only spawns holes inside the filled hole
     selected_hole: Optional[Hole] = None
-    holes: list[Hole] = field(default_factory=list)
\ No newline at end of file
+    functions: list[Function] = field(default_factory=list) # the functions of the module, in order
+    function_index: dict[str, Function] = field(default_factory=dict) # the functions with a signature by name
+    open_functions: dict[Function, None] = field(default_factory=dict) # the functions with unfilled holes, in the order in which they were opened
+    hole_count: int = 0 # the number of unfilled holes of all functions
+    hole_ids: dict[int, Hole] = field(default_factory=dict) # the unfilled holes by identifier
+    stale_functions: dict[Function, None] = field(default_factory=dict) # the functions with holes whose index is outdated
+    next_hole_id: int = 0
+    size: int = 0 # the number of nodes without types
+    history: deque[Edit] = field(default_factory=deque) # the applied edits, which keep their filled holes alive
+    future: list[Edit] = field(default_factory=list) # the reverted edits that can be reapplied
+
+    def get_holes(self) -> list[Hole]:
+        return [hole for function in self.functions for hole in function.holes]
+
+    def invalidate_indices(self, function: Function, start: int) -> None:
+        function.numbered = min(function.numbered, start)
+        self.stale_functions[function] = None
+
+    def number_holes(self) -> None:
+        # Hole indices are only updated before they are shown, such that filling a hole does not renumber all following holes of its function
+        for function in self.stale_functions:
+            for index in range(function.numbered, len(function.holes)):
+                hole = function.holes[index]
+                if hole.index != index:
+                    hole.index = index
+                    invalidate_ancestors(hole)
+            function.numbered = len(function.holes)
+        self.stale_functions.clear()
+
+    def replace_node(self, node: Hole, replacement: Any) -> Slot:
+        parent = node.parent
+        slot = find_slot(parent, node)
+        if isinstance(replacement, Block) and isinstance(parent, Block):
+            self.splice_slot(parent, slot, 1, replacement.statements)
+        else:
+            self.splice_slot(parent, slot, 1, [replacement])
+        node.parent = None
+        return slot
+
+    def splice_slot(self, parent: Any, slot: Slot, count: int, nodes: Sequence[Any]) -> None:
+        # Replaces the count nodes at the slot by the given nodes, which are adopted by the parent
+        field_name, index = slot
+        if index < 0:
+            setattr(parent, field_name, nodes[0])
+        else:
+            getattr(parent, field_name)[index:index + count] = nodes
+        for offset, node in enumerate(nodes):
+            if isinstance(node, (Statement, Hole)):
+                node.parent = parent
+                node.slot_index = index + offset
+        invalidate_node(parent, (index, count, len(nodes)) if index >= 0 and isinstance(parent, Block) else nodes[0])
+
+def find_index(nodes: Sequence[Any], node: Statement | Hole) -> int:
+    # Returns -1 if the node is not part of the nodes
+    if 0 <= node.slot_index < len(nodes) and nodes[node.slot_index] is node:
+        return node.slot_index
+    # The open hole of a block is usually its last statement
+    return next((i for i in reversed(range(len(nodes))) if nodes[i] is node), -1)
+
+def find_slot(parent: Any, node: Hole) -> Slot:
+    match parent:
+        case Program():
+            return ("statement", -1)
+        case CompositeStatement():
+            return ("first", -1) if parent.first is node else ("second", -1)
+        case Block():
+            return ("statements", find_index(parent.statements, node))
+        case FunctionDeclaration():
+            if parent.statement is node:
+                return ("statement", -1)
+            return ("parameters", find_index(parent.parameters, node))
+        case VariableDeclaration():
+            return ("expression", -1)
+        case ReturnStatement():
+            return ("value", -1)
+        case _:
+            raise UnexpectedValueError(parent)
+
+def invalidate_node(node: Any, change: Any) -> None:
+    # Records the change in the cached rendering of the node, which is either a changed child or, for blocks, a splice given by its index
+    # and the number of removed and added statements. The node is recorded as changed child in its ancestors, unless it was already recorded.
+    # A node without a cached rendering implies that its ancestors either have none or recorded it
+    while isinstance(node, Statement) and node.render_cache is not None:
+        changes = node.render_cache.changes
+        if changes is not None:
+            changes.append(change)
+            return
+        node.render_cache.changes = [change]
+        change = node
+        node = node.parent
+
+def invalidate_ancestors(node: Statement | Hole) -> None:
+    invalidate_node(node.parent, node)
@@ -0,0 +1,188 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from glob import glob
+from pathlib import Path
+from typing import Any, Iterable, Optional
+import argparse
+import json
+import os
+import sys
+
+from tactic_interpreter.compiler import CallOutcome, ProgramCompiler
+from tactic_interpreter.interpreter import Interpreter, InterpretationResult, TacticFailure
+from tactic_interpreter.utility import CompilationError
+from tactic_interpreter.validation import validate_file
+
+@dataclass
+class ScriptOutcome:
+    path: str
+    result: Optional[InterpretationResult] = None
+    error: Optional[str] = None # set if the script could not be interpreted at all
+    calls: Optional[list[CallOutcome]] = None # the outcomes of the test inputs, set if the finished program was run
+    static_failures: list[TacticFailure] = field(default_factory=list) # the syntax errors that rejected the script before interpreting it
+
+@dataclass
+class RunReport:
+    outcomes: list[ScriptOutcome] = field(default_factory=list)
+
+    def count_finished(self) -> int:
+        return sum(1 for outcome in self.outcomes if outcome.result is not None and outcome.result.finished)
+
+    def count_unfinished(self) -> int:
+        return sum(1 for outcome in self.outcomes if outcome.result is not None and not outcome.result.finished)
+
+    def count_failed(self) -> int:
+        return sum(1 for outcome in self.outcomes if outcome.result is None)
+
+def expand_paths(patterns: Iterable[str]) -> list[str]:
+    paths: list[str] = []
+    for pattern in patterns:
+        matches = sorted(glob(pattern, recursive=True))
+        # Patterns without matches are kept, such that missing files are reported instead of silently ignored
+        paths.extend(matches if len(matches) > 0 else [pattern])
+    return paths
+
+@dataclass
+class TestRun:
+    function: str
+    inputs: list[list[Any]] # the arguments of every call
+    cache_dir: Optional[str] = None
+    timeout: Optional[float] = None # the seconds after which a call is stopped and reported as failed
+
+compilers: dict[Optional[str], ProgramCompiler] = {} # the compilers of the worker process by cache directory
+
+def interprete_script(path: str, test_run: Optional[TestRun], check: bool) -> ScriptOutcome:
+    if check:
+        try:
+            validation = validate_file(path)
+        except (OSError, UnicodeDecodeError) as e:
+            return ScriptOutcome(path, error=str(e))
+        if len(validation.failures) > 0:
+            return ScriptOutcome(path, error=f"{len(validation.failures)} static errors", static_failures=validation.failures)
+    interpreter = Interpreter(quiet=True)
+    try:
+        outcome = ScriptOutcome(path, interpreter.interprete_file(path))
+    except (OSError, UnicodeDecodeError) as e:
+        return ScriptOutcome(path, error=str(e))
+    if test_run is not None and interpreter.finished:
+        if test_run.cache_dir not in compilers:
+            compilers[test_run.cache_dir] = ProgramCompiler(test_run.cache_dir)
+        try:
+            outcome.calls = compilers[test_run.cache_dir].run_function(interpreter.program, test_run.function, test_run.inputs, test_run.timeout)
+        except (OSError, CompilationError) as e:
+            outcome.error = str(e)
+    return outcome
+
+def run_script(path: str, test_run: Optional[TestRun] = None, check: bool = False) -> ScriptOutcome:
+    # Any other exception, e.g. a RecursionError for a deeply nested type, is the outcome of the script instead of aborting the whole run
+    try:
+        return interprete_script(path, test_run, check)
+    except Exception as e:
+        return ScriptOutcome(path, error=f"{type(e).__name__}: {e}")
+
+def run_scripts(patterns: Iterable[str], workers: Optional[int] = None, test_run: Optional[TestRun] = None, check: bool = False) -> RunReport:
+    paths = expand_paths(patterns)
+    if workers == 1 or len(paths) <= 1:
+        try:
+            return RunReport([run_script(path, test_run, check) for path in paths])
+        finally:
+            # The call processes of worker processes end with them
+            for compiler in compilers.values():
+                compiler.close()
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return RunReport(list(executor.map(partial(run_script, test_run=test_run, check=check), paths, chunksize=chunksize)))
+
+def load_inputs(path: str | Path) -> list[list[Any]]:
+    with Path(path).open() as stream:
+        inputs = json.load(stream)
+    if not isinstance(inputs, list) or not all(isinstance(arguments, list) for arguments in inputs):
+        raise ValueError("Expected a JSON list with the list of arguments of every call")
+    return inputs
+
+def print_report(report: RunReport) -> None:
+    for outcome in report.outcomes:
+        result = outcome.result
+        if result is None:
+            print(f"{outcome.path}: failed: {outcome.error}")
+            for failure in outcome.static_failures:
+                print(f"    Error in tactic {failure.number}: {failure.message}")
+            continue
+        status = "finished" if result.finished else f"unfinished ({result.remaining_holes} unfilled holes)"
+        print(f"{outcome.path}: {status}, {len(result.failures)} errors in {result.tactic_count} tactics")
+        for failure in result.failures:
+            print(f"    Error in tactic {failure.number}: {failure.message}")
+        if outcome.error is not None:
+            print(f"    Can not run the program: {outcome.error}")
+        for number, call in enumerate(outcome.calls or [], 1):
+            print(f"    Call {number}: {f"raised {call.error}" if call.error is not None else repr(call.value)}")
+    print(
+        f"{len(report.outcomes)} scripts: {report.count_finished()} finished, "
+        f"{report.count_unfinished()} unfinished, {report.count_failed()} failed"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Run many tactic scripts in parallel and report "
+            "the outcome of each script."
+        )
+    )
+    parser.add_argument(
+        "patterns",
+        nargs="+",
+        metavar="PATTERN",
+        help="Paths or glob patterns (e.g. 'scripts/**/*.txt') of the scripts to interpret.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="Number of worker processes. Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Parse every tactic of a script before interpreting it, and reject scripts with syntax errors without interpreting them.",
+    )
+    parser.add_argument(
+        "--function",
+        metavar="NAME",
+        help="Name of the function of the finished programs that is called with the test inputs. Requires --inputs.",
+    )
+    parser.add_argument(
+        "--inputs",
+        type=Path,
+        metavar="PATH",
+        help="Path to a JSON file with a list of the arguments of every call, e.g. '[[1, 2.5], [3, 0.0]]'.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10.0,
+        metavar="SECONDS",
+        help="Seconds after which a call with the test inputs is stopped and reported as failed (default: 10).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="PATH",
+        help="Directory in which the compiled programs are cached between runs and worker processes.",
+    )
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.timeout <= 0:
+        parser.error("--timeout must be positive")
+    if (args.function is None) != (args.inputs is None):
+        parser.error("--function and --inputs must be given together")
+    test_run = None
+    if args.function is not None:
+        try:
+            test_run = TestRun(args.function, load_inputs(args.inputs), args.cache_dir, args.timeout)
+        except (OSError, ValueError) as e:
+            parser.error(f"Can not load the inputs from {str(args.inputs)!r}: {e}")
+    report = run_scripts(args.patterns, args.workers, test_run, args.check)
+    print_report(report)
+    sys.exit(0 if report.count_finished() == len(report.outcomes) else 1)
@@ -0,0 +1,146 @@
+from io import StringIO
+from typing import Optional
+import argparse
+import asyncio
+import json
+
+from tactic_interpreter.interpreter import HISTORY_LIMIT, JSON_OUTPUT_MODES, OUTPUT_MODES, Interpreter
+from tactic_interpreter.utility import TacticError, TerminationException
+
+# Line protocol: a client sends the lines of a tactic followed by an empty line, like in the interactive mode.
+# The server answers every tactic (and the connection itself with the initial program) with the output
+# of the interpreter followed by an empty line. The connection is closed once the program is finished.
+
+class Session:
+    def __init__(self, history_limit: Optional[int], output_mode: str = "full"):
+        self.output = StringIO()
+        self.interpreter = Interpreter(history_limit=history_limit, output=self.output, output_mode=output_mode)
+        self.finished = False
+
+    def take_output(self) -> str:
+        text = self.output.getvalue()
+        self.output.seek(0)
+        self.output.truncate()
+        return text
+
+    def interprete_tactic(self, tactic: str) -> str:
+        try:
+            self.interpreter.interprete_tactic(tactic)
+        except TacticError as e:
+            self.interpreter.print_error(tactic, str(e))
+        except TerminationException:
+            self.finished = True
+        except Exception as e:
+            # Any other exception, e.g. a RecursionError for a deeply nested type, only rejects the tactic instead of ending the session
+            self.interpreter.print_error(tactic, f"The tactic failed unexpectedly: {type(e).__name__}: {e}")
+        return self.take_output()
+
+class SessionServer:
+    def __init__(
+        self,
+        max_sessions: int = 256,
+        idle_timeout: float = 600.0,
+        max_tactic_size: int = 64 * 1024,
+        history_limit: Optional[int] = HISTORY_LIMIT,
+        output_mode: str = "full",
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout # seconds after which an idle session is evicted
+        self.max_tactic_size = max_tactic_size # the maximal number of characters of a tactic
+        self.history_limit = history_limit
+        self.output_mode = output_mode
+        self.sessions: set[Session] = set()
+
+    async def send(self, writer: asyncio.StreamWriter, text: str) -> None:
+        writer.write(f"{text.rstrip("\n")}\n\n".encode())
+        # Waits for slow clients instead of buffering their output without bound
+        await writer.drain()
+
+    def error_response(self, message: str) -> str:
+        if self.output_mode in JSON_OUTPUT_MODES:
+            return json.dumps({"event": "error", "tactic": None, "message": message}, separators=(",", ":"))
+        return f"Error: {message}"
+
+    async def read_tactic(self, reader: asyncio.StreamReader) -> Optional[str]:
+        lines: list[str] = []
+        size = 0
+        while True:
+            try:
+                line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+            except ValueError:
+                # Lines longer than the limit of the stream can not be buffered
+                raise TacticError(f"Tactic exceeds {self.max_tactic_size} characters")
+            if line == b"":
+                return None
+            text = line.decode(errors="replace").rstrip("\r\n")
+            if text == "":
+                return "\n".join(lines)
+            size += len(text) + 1
+            if size > self.max_tactic_size:
+                raise TacticError(f"Tactic exceeds {self.max_tactic_size} characters")
+            lines.append(text)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            if len(self.sessions) >= self.max_sessions:
+                await self.send(writer, self.error_response("Too many sessions, try again later"))
+                return
+            session = Session(self.history_limit, self.output_mode)
+            self.sessions.add(session)
+            try:
+                await self.send(writer, session.take_output())
+                while not session.finished:
+                    try:
+                        tactic = await self.read_tactic(reader)
+                    except asyncio.TimeoutError:
+                        await self.send(writer, self.error_response("Session closed after being idle"))
+                        return
+                    except TacticError as e:
+                        await self.send(writer, self.error_response(str(e)))
+                        return
+                    if tactic is None:
+                        return
+                    await self.send(writer, session.interprete_tactic(tactic))
+            finally:
+                self.sessions.discard(session)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve_tcp(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=self.max_tactic_size)
+        async with server:
+            await server.serve_forever()
+
+    async def serve_unix(self, path: str) -> None:
+        server = await asyncio.start_unix_server(self.handle_connection, path, limit=self.max_tactic_size)
+        async with server:
+            await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Serve many interpreter sessions in one process "
+            "over a TCP or Unix socket."
+        )
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Host to listen on for TCP connections.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on for TCP connections.")
+    parser.add_argument("--unix", metavar="PATH", help="Path of a Unix socket to listen on instead of TCP.")
+    parser.add_argument("--max-sessions", type=int, default=256, metavar="N", help="Maximal number of concurrent sessions.")
+    parser.add_argument("--idle-timeout", type=float, default=600.0, metavar="SECONDS", help="Seconds after which idle sessions are closed.")
+    parser.add_argument("--output", choices=OUTPUT_MODES, default="full", help="Whether sessions print the whole program, only the changed lines as hunks like those of 'diff -U0', or one JSON event per line with the program as rendered lines ('json') or as serialized AST ('json-ast').")
+    args = parser.parse_args()
+    session_server = SessionServer(max_sessions=args.max_sessions, idle_timeout=args.idle_timeout, output_mode=args.output)
+    try:
+        if args.unix is not None:
+            asyncio.run(session_server.serve_unix(args.unix))
+        else:
+            asyncio.run(session_server.serve_tcp(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from tactic_interpreter.parser import parse_description_data, parse_fill_data, parse_intro_data, parse_let_data, parse_no_data, parse_signature_data, parse_switch_data
+
+# Every tactic is registered with a bit, such that the tactics of a hole are stored as a bit mask, and with the parser of its data.
+# The interpreter applies the parsed data with its method named by the handler, such that a new tactic is added by registering it
+# and implementing that method in a subclass of the interpreter
+
+@dataclass(frozen=True, slots=True)
+class Tactic:
+    name: str
+    mask: int # the bit of the tactic in the tactic masks
+    parse: Callable[[str], Any] # parses the data after the keyword into the payload of the tactic
+    handler: str # the name of the method of the interpreter that applies the payload
+
+class TacticRegistry:
+    def __init__(self):
+        self.tactics: dict[str, Tactic] = {}
+        self.names: dict[int, tuple[str, ...]] = {} # the names of the tactics of the listed masks, in the order of registration
+
+    def __iter__(self) -> Iterator[Tactic]:
+        return iter(self.tactics.values())
+
+    def register(self, name: str, parse: Callable[[str], Any]) -> Tactic:
+        if name in self.tactics:
+            raise ValueError(f"The tactic {name!r} is already registered")
+        tactic = Tactic(name, 1 << len(self.tactics), parse, f"apply_{name}")
+        self.tactics[name] = tactic
+        self.names.clear()
+        return tactic
+
+    def get(self, name: str) -> Optional[Tactic]:
+        return self.tactics.get(name)
+
+    def get_mask(self, names: Iterable[str]) -> int:
+        # Raises a KeyError for names of tactics that are not registered
+        mask = 0
+        for name in names:
+            mask |= self.tactics[name].mask
+        return mask
+
+    def get_names(self, mask: int) -> tuple[str, ...]:
+        names = self.names.get(mask)
+        if names is None:
+            names = tuple(tactic.name for tactic in self.tactics.values() if tactic.mask & mask)
+            self.names[mask] = names
+        return names
+
+TACTIC_REGISTRY = TacticRegistry()
+
+DESCRIPTION = TACTIC_REGISTRY.register("description", parse_description_data)
+SIGNATURE = TACTIC_REGISTRY.register("signature", parse_signature_data)
+INTRO = TACTIC_REGISTRY.register("intro", parse_intro_data)
+LET = TACTIC_REGISTRY.register("let", parse_let_data)
+RETURN = TACTIC_REGISTRY.register("return", parse_no_data)
+FILL = TACTIC_REGISTRY.register("fill", parse_fill_data)
+SWITCH = TACTIC_REGISTRY.register("switch", parse_switch_data)
+UNDO = TACTIC_REGISTRY.register("undo", parse_no_data)
+REDO = TACTIC_REGISTRY.register("redo", parse_no_data)
+FINISH = TACTIC_REGISTRY.register("finish", parse_no_data)
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional, TextIO
+import json
+
+from tactic_interpreter.checkpoint import CheckpointDecoder, type_to_data
+from tactic_interpreter.instrumentation import InterpreterHooks
+from tactic_interpreter.program import Identifier, InjectedExpression, Program, Type
+from tactic_interpreter.utility import CheckpointError, TraceError
+
+# A trace is an append-only log with one JSON line per tactic: the tactic as typed, its status ("ok", "error" or "finished"),
+# its keyword and parsed payload if parsing succeeded and the error message of rejected tactics.
+# Payloads are stored like the nodes of checkpoints: strings, integers and null are stored as they are, all other values are lists starting with a tag
+
+NOT_PARSED = object() # the payload of a tactic that was not parsed (yet)
+TRACE_STATUSES = frozenset({"ok", "error", "finished"})
+
+@dataclass
+class TraceRecord:
+    tactic: str
+    status: str
+    keyword: Optional[str] = None
+    payload: Any = NOT_PARSED
+    error: Optional[str] = None
+
+def payload_to_data(payload: Any) -> Any:
+    match payload:
+        case None | int() | str():
+            return payload
+        case Identifier(value):
+            return ["identifier", value]
+        case InjectedExpression(value):
+            return ["expression", value]
+        case Type():
+            return ["type", type_to_data(payload)]
+        case tuple():
+            return ["tuple", [payload_to_data(value) for value in payload]]
+        case _:
+            raise TraceError(f"Can not store the payload {payload!r}")
+
+def data_to_payload(data: Any, decoder: CheckpointDecoder) -> Any:
+    # Dispatches on the tag instead of matching sequence patterns, as replaying decodes a payload for every tactic
+    if not isinstance(data, list):
+        if data is None or isinstance(data, (int, str)):
+            return data
+        raise TraceError(f"Invalid payload {data!r}")
+    if len(data) != 2:
+        raise TraceError(f"Invalid payload {data!r}")
+    tag, value = data
+    if tag == "tuple" and isinstance(value, list):
+        return tuple([data_to_payload(sub_value, decoder) for sub_value in value])
+    if tag == "identifier" and isinstance(value, str):
+        return Identifier(value)
+    if tag == "expression" and isinstance(value, str):
+        return InjectedExpression(value)
+    if tag == "type":
+        try:
+            return decoder.data_to_type(value)
+        except CheckpointError as e:
+            raise TraceError(str(e))
+    raise TraceError(f"Invalid payload {data!r}")
+
+def record_to_data(record: TraceRecord) -> dict[str, Any]:
+    data: dict[str, Any] = {"tactic": record.tactic, "status": record.status}
+    if record.keyword is not None and record.payload is not NOT_PARSED:
+        data["keyword"] = record.keyword
+        data["payload"] = payload_to_data(record.payload)
+    if record.error is not None:
+        data["error"] = record.error
+    return data
+
+def data_to_record(data: Any, decoder: CheckpointDecoder) -> TraceRecord:
+    if not isinstance(data, dict) or not isinstance(data.get("tactic"), str) or data.get("status") not in TRACE_STATUSES:
+        raise TraceError(f"Invalid trace record {data!r}")
+    keyword = data.get("keyword")
+    error = data.get("error")
+    record = TraceRecord(data["tactic"], data["status"], error=error if isinstance(error, str) else None)
+    if isinstance(keyword, str) and "payload" in data:
+        record.keyword = keyword
+        record.payload = data_to_payload(data["payload"], decoder)
+    return record
+
+def read_trace(stream: TextIO) -> Iterator[TraceRecord]:
+    decoder = CheckpointDecoder()
+    for number, line in enumerate(stream, 1):
+        if line.strip() == "":
+            continue
+        try:
+            yield data_to_record(json.loads(line), decoder)
+        except json.JSONDecodeError as e:
+            raise TraceError(f"Invalid trace record in line {number}: {e}")
+
+class TraceRecorder(InterpreterHooks):
+    def __init__(self, output: TextIO):
+        self.output = output # records are flushed, such that the trace is complete up to the last tactic if the session is interrupted
+        self.record: Optional[TraceRecord] = None
+
+    def on_tactic_start(self, tactic: str) -> None:
+        self.record = TraceRecord(tactic, "")
+
+    def on_tactic_parsed(self, keyword: str, payload: Any) -> None:
+        if self.record is not None:
+            self.record.keyword = keyword
+            self.record.payload = payload
+
+    def on_tactic_end(self, status: str, error: Optional[str], program: Program) -> None:
+        if self.record is None:
+            return
+        self.record.status = status
+        self.record.error = error
+        self.output.write(json.dumps(record_to_data(self.record), separators=(",", ":")) + "\n")
+        self.output.flush()
+        self.record = None
@@ -0,0 +1,204 @@
+from typing import Optional
+import ast
+import builtins
+
+from tactic_interpreter.parser import parse_expression_tree
+from tactic_interpreter.program import Function, FunctionType, Hole, Identifier, InjectedExpression, PrimitiveType, Program, ReturnStatement, Type, VariableDeclaration
+from tactic_interpreter.utility import TacticError
+from tactic_interpreter.visualise import type_to_str
+
+# Expressions are checked leniently: constructs that are not modelled (e.g. attributes, subscripts or lambdas) have an unknown type,
+# which is compatible with every type, such that only definite type errors are reported
+
+NUMERIC_RANKS = {"bool": 0, "int": 1, "float": 2, "complex": 3} # a value of a numeric type can be used for every type with a higher rank
+BUILTIN_NAMES = frozenset(dir(builtins))
+CONVERSIONS = frozenset({"bool", "int", "float", "complex", "str"}) # builtins whose calls have a known type
+
+OPERATOR_SYMBOLS: dict[type, str] = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.FloorDiv: "//",
+    ast.Mod: "%",
+    ast.Pow: "**",
+    ast.MatMult: "@",
+    ast.BitAnd: "&",
+    ast.BitOr: "|",
+    ast.BitXor: "^",
+    ast.LShift: "<<",
+    ast.RShift: ">>",
+}
+
+def get_numeric_rank(type_: Optional[Type]) -> Optional[int]:
+    if isinstance(type_, PrimitiveType):
+        return NUMERIC_RANKS.get(type_.value)
+    return None
+
+def get_numeric_type(rank: int) -> PrimitiveType:
+    return PrimitiveType(next(value for value, value_rank in NUMERIC_RANKS.items() if value_rank == rank)) # type:ignore
+
+def is_assignable(expected: Type, actual: Optional[Type]) -> bool:
+    if actual is None or expected is actual:
+        return True
+    expected_rank = get_numeric_rank(expected)
+    actual_rank = get_numeric_rank(actual)
+    if expected_rank is not None and actual_rank is not None:
+        return actual_rank <= expected_rank
+    if isinstance(expected, FunctionType) and isinstance(actual, FunctionType):
+        return (
+            len(expected.parameter_types) == len(actual.parameter_types)
+            and all(is_assignable(actual_type, expected_type) for expected_type, actual_type in zip(expected.parameter_types, actual.parameter_types))
+            and is_assignable(expected.return_type, actual.return_type)
+        )
+    return False
+
+def join_types(first: Optional[Type], second: Optional[Type]) -> Optional[Type]:
+    if first is second:
+        return first
+    first_rank = get_numeric_rank(first)
+    second_rank = get_numeric_rank(second)
+    if first_rank is not None and second_rank is not None:
+        return get_numeric_type(max(first_rank, second_rank))
+    return None
+
+class TypeChecker:
+    def __init__(self):
+        self.hole: Optional[Hole] = None # the hole whose filler is checked
+        self.function_index: dict[str, Function] = {}
+
+    def get_expected_type(self, hole: Hole) -> Optional[Type]:
+        match hole.parent:
+            case VariableDeclaration(type_=type_):
+                return type_
+            case ReturnStatement():
+                if hole.function is not None and hole.function.declaration is not None:
+                    return hole.function.declaration.function_type.return_type
+        return None
+
+    def lookup_name(self, name: str) -> Optional[Type]:
+        # Local variables shadow the parameters, which shadow the functions of the module
+        hole = self.hole
+        if hole is not None and hole.scope is not None:
+            type_ = hole.scope.lookup(name)
+            if type_ is not None:
+                return type_
+        declaration = None if hole is None or hole.function is None else hole.function.declaration
+        if declaration is not None:
+            for parameter, parameter_type in zip(declaration.parameters, declaration.function_type.parameter_types):
+                if isinstance(parameter, Identifier) and parameter.value == name:
+                    return parameter_type
+        function = self.function_index.get(name)
+        if function is not None and function.declaration is not None:
+            return function.declaration.function_type
+        if name in BUILTIN_NAMES:
+            return None
+        raise TacticError(f"Unknown name {name!r}")
+
+    def infer(self, node: ast.expr) -> Optional[Type]:
+        match node:
+            case ast.Constant(value=bool()):
+                return PrimitiveType("bool")
+            case ast.Constant(value=int()):
+                return PrimitiveType("int")
+            case ast.Constant(value=float()):
+                return PrimitiveType("float")
+            case ast.Constant(value=complex()):
+                return PrimitiveType("complex")
+            case ast.Constant(value=str()):
+                return PrimitiveType("str")
+            case ast.JoinedStr():
+                return PrimitiveType("str")
+            case ast.Name(id=name):
+                return self.lookup_name(name)
+            case ast.UnaryOp(op=ast.Not(), operand=operand):
+                self.infer(operand)
+                return PrimitiveType("bool")
+            case ast.UnaryOp(operand=operand):
+                rank = get_numeric_rank(self.infer(operand))
+                return None if rank is None else get_numeric_type(max(rank, NUMERIC_RANKS["int"]))
+            case ast.BinOp(left=left, op=op, right=right):
+                return self.infer_binary_operation(op, self.infer(left), self.infer(right))
+            case ast.BoolOp(values=values):
+                types = [self.infer(value) for value in values]
+                return types[0] if all(type_ is types[0] for type_ in types) else None
+            case ast.Compare(left=left, comparators=comparators):
+                self.infer(left)
+                for comparator in comparators:
+                    self.infer(comparator)
+                return PrimitiveType("bool")
+            case ast.IfExp(test=test, body=body, orelse=orelse):
+                self.infer(test)
+                return join_types(self.infer(body), self.infer(orelse))
+            case ast.Call():
+                return self.infer_call(node)
+            case _:
+                return None
+
+    def infer_binary_operation(self, op: ast.operator, left: Optional[Type], right: Optional[Type]) -> Optional[Type]:
+        if left is None or right is None:
+            return None
+        left_rank = get_numeric_rank(left)
+        right_rank = get_numeric_rank(right)
+        str_type = PrimitiveType("str")
+        match op:
+            case ast.Add() | ast.Sub() | ast.Mult() | ast.FloorDiv() | ast.Mod() if left_rank is not None and right_rank is not None:
+                return get_numeric_type(max(left_rank, right_rank, NUMERIC_RANKS["int"]))
+            case ast.Div() if left_rank is not None and right_rank is not None:
+                return get_numeric_type(max(left_rank, right_rank, NUMERIC_RANKS["float"]))
+            case ast.Pow() if left_rank is not None and right_rank is not None:
+                # The power of integers is a float for negative exponents
+                rank = max(left_rank, right_rank)
+                return None if rank <= NUMERIC_RANKS["int"] else get_numeric_type(rank)
+            case ast.BitAnd() | ast.BitOr() | ast.BitXor() if left_rank == right_rank == NUMERIC_RANKS["bool"]:
+                return PrimitiveType("bool")
+            case ast.BitAnd() | ast.BitOr() | ast.BitXor() | ast.LShift() | ast.RShift() if (
+                left_rank is not None and left_rank <= NUMERIC_RANKS["int"] and right_rank is not None and right_rank <= NUMERIC_RANKS["int"]
+            ):
+                return PrimitiveType("int")
+            case ast.Add() if left is str_type and right is str_type:
+                return str_type
+            case ast.Mult() if (left is str_type and right_rank is not None and right_rank <= NUMERIC_RANKS["int"]) or (
+                right is str_type and left_rank is not None and left_rank <= NUMERIC_RANKS["int"]
+            ):
+                return str_type
+            case ast.Mod() if left is str_type:
+                return str_type
+        raise TacticError(f"Unsupported operand types for {OPERATOR_SYMBOLS[type(op)]}: {type_to_str(left)!r} and {type_to_str(right)!r}")
+
+    def infer_call(self, node: ast.Call) -> Optional[Type]:
+        argument_types = [self.infer(argument) for argument in node.args if not isinstance(argument, ast.Starred)]
+        match node.func:
+            case ast.Name(id=name):
+                function_type = self.lookup_name(name)
+                if function_type is None and name in CONVERSIONS:
+                    return PrimitiveType(name) # type:ignore
+            case func:
+                function_type = self.infer(func)
+        if function_type is None:
+            return None
+        if not isinstance(function_type, FunctionType):
+            raise TacticError(f"An expression of type {type_to_str(function_type)!r} is not callable")
+        if len(argument_types) == len(node.args) and len(node.keywords) == 0:
+            # Calls with unpacked or keyword arguments are not checked
+            if len(argument_types) != len(function_type.parameter_types):
+                raise TacticError(f"Expected {len(function_type.parameter_types)} arguments, found {len(argument_types)}")
+            for position, (parameter_type, argument_type) in enumerate(zip(function_type.parameter_types, argument_types), 1):
+                if not is_assignable(parameter_type, argument_type):
+                    raise TacticError(f"Expected argument {position} of type {type_to_str(parameter_type)!r}, found {type_to_str(argument_type)!r}") # type:ignore
+        return function_type.return_type
+
+    def check_fill(self, program: Program, hole: Hole, expression: InjectedExpression) -> None:
+        # Only the new expression is checked, the variables are looked up in the scope that was stored in the hole
+        self.hole = hole
+        self.function_index = program.function_index
+        try:
+            tree = parse_expression_tree(expression.value)
+            actual = None if tree is None else self.infer(tree)
+        except RecursionError:
+            actual = None # expressions that are nested too deeply for the recursive inference have an unknown type
+        finally:
+            self.hole = None
+        expected = self.get_expected_type(hole)
+        if expected is not None and not is_assignable(expected, actual):
+            raise TacticError(f"Expected an expression of type {type_to_str(expected)!r}, found {type_to_str(actual)!r}") # type:ignore
@@ -11,6 +11,15 @@ class TacticError(Exception):
 class TerminationException(Exception):
     pass
 
+class CheckpointError(Exception):
+    pass
+
+class CompilationError(Exception):
+    pass
+
+class TraceError(Exception):
+    pass
+
 def pad_str(string: str, padding: str = "    ") -> str:
     lines = [f"{padding}{line}" for line in string.split("\n")]
     return "\n".join(lines)
\ No newline at end of file
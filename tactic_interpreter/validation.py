@@ -0,0 +1,44 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, TextIO
+
+from tactic_interpreter.interpreter import TacticFailure
+from tactic_interpreter.parser import read_tactics, split_tactic
+from tactic_interpreter.tactics import TACTIC_REGISTRY
+from tactic_interpreter.utility import TacticError
+
+# Tactics are only parsed, without applying them to a program. Errors that depend on the program
+# (e.g. tactics that can not be applied to the selected hole, or type errors) are only found by the interpreter
+
+@dataclass
+class ValidationResult:
+    tactic_count: int
+    failures: list[TacticFailure] = field(default_factory=list)
+
+def validate_tactic(tactic: str) -> None:
+    keyword, data = split_tactic(tactic)
+    registered = TACTIC_REGISTRY.get(keyword)
+    if registered is None:
+        raise TacticError(f"Unknown tactic {keyword!r}")
+    registered.parse(data)
+
+def validate_tactics(tactics: Iterable[str]) -> ValidationResult:
+    failures: list[TacticFailure] = []
+    tactic_count = 0
+    for tactic in tactics:
+        tactic_count += 1
+        try:
+            validate_tactic(tactic)
+        except TacticError as e:
+            failures.append(TacticFailure(tactic_count, tactic, str(e)))
+    return ValidationResult(tactic_count, failures)
+
+def validate_stream(stream: TextIO) -> ValidationResult:
+    return validate_tactics(read_tactics(stream))
+
+def validate_file(file_path: str | Path) -> ValidationResult:
+    file_path = Path(file_path)
+    if not file_path.is_file():
+        raise FileNotFoundError("File not found")
+    with file_path.open() as stream:
+        return validate_stream(stream)
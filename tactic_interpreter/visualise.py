@@ -1,6 +1,6 @@
-from typing import Optional
-from tactic_interpreter.utility import UnexpectedValueError, pad_str
-from tactic_interpreter.program import Type, DescriptionStatement, CompositeStatement, EmptyStatement, Expression, FunctionDeclaration, FunctionType, PrimitiveType, Program, InjectedExpression, Statement, VariableDeclaration, ReturnStatement, Hole, Identifier
+from typing import Any, Optional, Sequence
+from tactic_interpreter.utility import UnexpectedValueError
+from tactic_interpreter.program import RenderCache, Type, Block, DescriptionStatement, CompositeStatement, EmptyStatement, Expression, FunctionDeclaration, FunctionType, PrimitiveType, Program, InjectedExpression, Statement, VariableDeclaration, ReturnStatement, Hole, Identifier, find_index
 
 def hole_to_str(hole: Hole) -> str:
     return f"[{hole.index}{"*" if hole.selected else ""}]"
@@ -36,40 +36,286 @@ def expression_to_str(expression: Expression | Hole) -> str:
         case _:
             raise UnexpectedValueError(expression)
 
-def statement_to_str(statement: Statement | Hole) -> str:
+Hunk = tuple[int, int, list[str]] # the first replaced line, the number of replaced lines and the lines that replace them
+
+def signature_to_str(declaration: FunctionDeclaration) -> str:
+    name_str = identifier_to_str(declaration.name)
+    parameter_list: list[str] = []
+    for parameter, parameter_type in zip(declaration.parameters, declaration.function_type.parameter_types):
+        parameter_str = identifier_to_str(parameter)
+        parameter_type_str = type_to_str(parameter_type)
+        parameter_list.append(f"{parameter_str}: {parameter_type_str}")
+    parameter_list_str = ", ".join(parameter_list)
+    return_type_str = type_to_str(declaration.function_type.return_type)
+    return f"def {name_str}({parameter_list_str}) -> {return_type_str}:"
+
+def render_statement(statement: Statement, prefix: str) -> RenderCache:
+    # Renders the statement from scratch, reusing the cached lines of its children
+    counts: Optional[list[int]] = None
     match statement:
-        case Hole():
-            return hole_to_str(statement)
         case EmptyStatement():
-                return ""
+            lines = [prefix]
         case DescriptionStatement(value):
-            return f"{pad_str(value, "# ")}"
+            lines = [f"{prefix}# {line}" for line in value.split("\n")]
         case CompositeStatement(first, second):
-            first_str = statement_to_str(first)
-            second_str = statement_to_str(second)
-            return f"{first_str}\n{second_str}"
-        case FunctionDeclaration(name, function_type, parameters, statement):
-            name_str = identifier_to_str(name)
-            parameter_list: list[str] = []
-            for parameter, parameter_type in zip(parameters, function_type.parameter_types):
-                parameter_str = identifier_to_str(parameter)
-                parameter_type_str = type_to_str(parameter_type)
-                parameter_list.append(f"{parameter_str}: {parameter_type_str}")
-            parameter_list_str = ", ".join(parameter_list)
-            return_type_str = type_to_str(function_type.return_type)
-            signature_str = f"def {name_str}({parameter_list_str}) -> {return_type_str}:"
-            statement_str = statement_to_str(statement)
-            return f"{signature_str}\n{pad_str(statement_str, "    ")}"
+            first_lines = statement_to_lines(first, prefix)
+            second_lines = statement_to_lines(second, prefix)
+            lines = first_lines + second_lines
+            counts = [len(first_lines), len(second_lines)]
+        case Block(statements):
+            lines = []
+            counts = []
+            for sub_statement in statements:
+                sub_lines = statement_to_lines(sub_statement, prefix)
+                lines.extend(sub_lines)
+                counts.append(len(sub_lines))
+            if len(lines) == 0:
+                lines.append(prefix)
+            return RenderCache(prefix, lines, counts=counts, offsets=[0])
+        case FunctionDeclaration(_, _, _, statement_):
+            lines = [f"{prefix}{signature_to_str(statement)}"] + statement_to_lines(statement_, f"{prefix}    ")
         case VariableDeclaration(name, type_, expression):
             name_str = identifier_to_str(name)
             type_str = type_to_str(type_)
             expression_str = expression_to_str(expression)
-            return f"{name_str}: {type_str} = {expression_str}"
+            lines = [f"{prefix}{line}" for line in f"{name_str}: {type_str} = {expression_str}".split("\n")]
         case ReturnStatement(expression):
             expression_str = expression_to_str(expression)
-            return f"return {expression_str}"
+            lines = [f"{prefix}{line}" for line in f"return {expression_str}".split("\n")]
         case _:
             raise UnexpectedValueError(statement)
+    return RenderCache(prefix, lines, counts=counts)
+
+def statement_to_lines(statement: Statement | Hole, prefix: str = "") -> list[str]:
+    # The returned lines may be shared with the render cache, they must not be modified and are changed by later renderings
+    if not isinstance(statement, Statement):
+        match statement:
+            case Hole():
+                return [f"{prefix}{hole_to_str(statement)}"]
+            case _:
+                raise UnexpectedValueError(statement)
+    cache = statement.render_cache
+    if cache is None or cache.prefix != prefix:
+        cache = render_statement(statement, prefix)
+        statement.render_cache = cache
+    elif cache.changes is not None:
+        update_lines(statement)
+    return statement.render_cache.lines
+
+def count_delta(hunks: list[Hunk]) -> int:
+    return sum(len(lines) - count for _, count, lines in hunks)
+
+def shift_hunks(hunks: list[Hunk], start: int) -> list[Hunk]:
+    return [(start + hunk_start, count, lines) for hunk_start, count, lines in hunks]
+
+def merge_hunks(hunks: list[Hunk]) -> list[Hunk]:
+    # Adjacent hunks are merged, such that a run of changed statements is a single hunk for the ancestors
+    merged: list[Hunk] = []
+    copied = False # whether the lines of the last merged hunk are a new list
+    for start, count, lines in hunks:
+        if len(merged) > 0 and merged[-1][0] + merged[-1][1] == start:
+            merged_start, merged_count, merged_lines = merged[-1]
+            if not copied:
+                merged_lines = list(merged_lines)
+                copied = True
+            merged_lines.extend(lines)
+            merged[-1] = (merged_start, merged_count + count, merged_lines)
+        else:
+            merged.append((start, count, lines))
+            copied = False
+    return merged
+
+def apply_hunks(lines: list[str], hunks: list[Hunk]) -> None:
+    # The hunks are spliced into the lines from the last one, such that the starts of the others stay valid
+    for start, count, replacement in reversed(hunks):
+        lines[start:start + count] = replacement
+
+def update_child_lines(child: Statement | Hole, prefix: str, count: int) -> list[Hunk]:
+    # Returns the changes of the lines of a child that had count lines, relative to its first line
+    if isinstance(child, (Block, CompositeStatement, FunctionDeclaration)) and child.render_cache is not None and child.render_cache.prefix == prefix and child.render_cache.changes is not None:
+        return update_lines(child)
+    if isinstance(child, Statement) and child.render_cache is not None and child.render_cache.changes is not None:
+        # Other statements are rendered from scratch
+        child.render_cache = None
+    return [(0, count, statement_to_lines(child, prefix))]
+
+def get_offset(cache: RenderCache, index: int) -> int:
+    # The first line of the statement at the index of a block, or the number of lines for the index after the last statement
+    offsets, counts = cache.offsets, cache.counts
+    if offsets is None or counts is None:
+        raise UnexpectedValueError(cache)
+    while len(offsets) <= index:
+        offsets.append(offsets[-1] + counts[len(offsets) - 1])
+    return offsets[index]
+
+def update_block_lines(block: Block, cache: RenderCache, changes: list[Any]) -> Optional[list[Hunk]]:
+    # The changed statements are found by their index and located by the offsets of the statements that were rendered.
+    # A single splice is located by its index in the rendered statements.
+    # Blocks with more splices, or in which most statements changed, are rendered from scratch
+    statements, counts = block.statements, cache.counts
+    splices = [change for change in changes if isinstance(change, tuple)]
+    if len(splices) > 1 or len(statements) == 0 or counts is None or len(counts) == 0:
+        return None
+    index, removed, added = splices[0] if len(splices) > 0 else (len(counts), 0, 0)
+    changed: dict[int, Statement | Hole] = {} # the changed statements by their index in the rendered statements
+    for change in changes:
+        if isinstance(change, tuple):
+            continue
+        position = find_index(statements, change)
+        if position >= 0 and not index <= position < index + added:
+            changed[position if position < index else position - added + removed] = change
+    if len(changed) * 2 > len(statements):
+        return None
+    splice_hunk: Optional[Hunk] = None
+    spliced_counts: list[int] = []
+    if len(splices) > 0:
+        spliced_lines: list[str] = []
+        for statement in statements[index:index + added]:
+            statement_lines = statement_to_lines(statement, cache.prefix)
+            spliced_lines.extend(statement_lines)
+            spliced_counts.append(len(statement_lines))
+        start = get_offset(cache, index)
+        splice_hunk = (start, get_offset(cache, index + removed) - start, spliced_lines)
+    hunks: list[Hunk] = []
+    new_counts: dict[int, int] = {}
+    for position in sorted(changed):
+        if splice_hunk is not None and position >= index:
+            hunks.append(splice_hunk)
+            splice_hunk = None
+        start = get_offset(cache, position)
+        count = counts[position]
+        for child_start, child_count, child_lines in update_child_lines(changed[position], cache.prefix, count):
+            hunks.append((start + child_start, child_count, child_lines))
+            count += len(child_lines) - child_count
+        new_counts[position] = count
+    if splice_hunk is not None:
+        hunks.append(splice_hunk)
+    # The offsets after the first statement whose number of lines changed are recomputed on demand
+    first_changed = index
+    for position, count in new_counts.items():
+        if count != counts[position]:
+            counts[position] = count
+            first_changed = min(first_changed, position)
+    counts[index:index + removed] = spliced_counts
+    del cache.offsets[first_changed + 1:] # type:ignore
+    return merge_hunks(hunks)
+
+def update_hunks(statement: Statement, cache: RenderCache) -> Optional[list[Hunk]]:
+    # Renders only the recorded changes of the statement and returns them as hunks of its cached lines, in the order of their lines.
+    # The lines of the statement itself are not changed, None means that it has to be rendered from scratch
+    if cache.changes is None:
+        raise UnexpectedValueError(statement)
+    changes = cache.changes
+    cache.changes = None
+    hunks: Optional[list[Hunk]] = None
+    match statement:
+        case Block():
+            hunks = update_block_lines(statement, cache, changes)
+        case CompositeStatement(first, second) if cache.counts is not None:
+            hunks = []
+            start = 0
+            for position, child in enumerate((first, second)):
+                count = cache.counts[position]
+                if any(change is child for change in changes):
+                    child_hunks = update_child_lines(child, cache.prefix, count)
+                    cache.counts[position] = count + count_delta(child_hunks)
+                    hunks.extend(shift_hunks(child_hunks, start))
+                start += count
+        case FunctionDeclaration(_, _, _, statement_):
+            hunks = []
+            if any(change is not statement_ for change in changes):
+                hunks.append((0, 1, [f"{cache.prefix}{signature_to_str(statement)}"]))
+            if any(change is statement_ for change in changes):
+                hunks.extend(shift_hunks(update_child_lines(statement_, f"{cache.prefix}    ", len(cache.lines) - 1), 1))
+    return hunks
+
+def update_lines(statement: Statement) -> list[Hunk]:
+    cache = statement.render_cache
+    if cache is None:
+        raise UnexpectedValueError(statement)
+    hunks = update_hunks(statement, cache)
+    if hunks is None:
+        statement.render_cache = render_statement(statement, cache.prefix)
+        return [(0, len(cache.lines), statement.render_cache.lines)]
+    apply_hunks(cache.lines, hunks)
+    return hunks
+
+def statement_to_str(statement: Statement | Hole) -> str:
+    return "\n".join(statement_to_lines(statement))
+
+def program_to_lines(program: Program, prefix: str = "") -> list[str]:
+    # The lines are copied, as the cached lines are changed by later renderings
+    program.number_holes()
+    return list(statement_to_lines(program.statement, prefix))
 
 def program_to_str(program: Program) -> str:
-    return statement_to_str(program.statement)
\ No newline at end of file
+    program.number_holes()
+    return "\n".join(statement_to_lines(program.statement))
+
+def same_line(old_line: str, new_line: str) -> bool:
+    return old_line is new_line or old_line == new_line
+
+def lines_to_delta(old_lines: Sequence[str], new_lines: Sequence[str], old_offset: int = 0, new_offset: int = 0) -> list[str]:
+    # Returns the changed lines as hunks without context, like "diff -U0", with line numbers shifted by the offsets.
+    # Lines of unchanged subtrees are shared with the render cache, such that they are mostly matched by identity
+    start = 0
+    while start < min(len(old_lines), len(new_lines)) and same_line(old_lines[start], new_lines[start]):
+        start += 1
+    old_end = len(old_lines)
+    new_end = len(new_lines)
+    while old_end > start and new_end > start and same_line(old_lines[old_end - 1], new_lines[new_end - 1]):
+        old_end -= 1
+        new_end -= 1
+    positions: dict[int, list[int]] = {}
+    for index in range(start, old_end):
+        positions.setdefault(id(old_lines[index]), []).append(index)
+    delta: list[str] = []
+    old_index = new_index = start
+    while old_index < old_end or new_index < new_end:
+        if old_index < old_end and new_index < new_end and same_line(old_lines[old_index], new_lines[new_index]):
+            old_index += 1
+            new_index += 1
+            continue
+        old_start, new_start = old_index, new_index
+        old_index = old_end
+        while new_index < new_end:
+            if old_start < old_end and same_line(old_lines[old_start], new_lines[new_index]):
+                old_index = old_start
+                break
+            # A line that is still part of the old rendering ends the hunk, the old lines in front of it were removed
+            match = next((index for index in positions.get(id(new_lines[new_index]), []) if index >= old_start), None)
+            if match is not None:
+                old_index = match
+                break
+            new_index += 1
+        old_count = old_index - old_start
+        new_count = new_index - new_start
+        delta.append(f"@@ -{old_offset + old_start + (old_count > 0)},{old_count} +{new_offset + new_start + (new_count > 0)},{new_count} @@")
+        delta.extend(f"-{line}" for line in old_lines[old_start:old_index])
+        delta.extend(f"+{line}" for line in new_lines[new_start:new_index])
+    return delta
+
+def program_to_delta(program: Program, old_lines: Optional[list[str]], prefix: str = "") -> tuple[list[str], list[str]]:
+    # Returns the lines of the program and their delta to the old lines, which are the lines returned by the last call.
+    # As long as those are the cached lines of the program, only the recorded changes are rendered and compared before they are spliced into them
+    program.number_holes()
+    statement = program.statement
+    if old_lines is None:
+        return statement_to_lines(statement, prefix), []
+    cache = statement.render_cache if isinstance(statement, Statement) else None
+    if cache is None or cache.prefix != prefix or cache.lines is not old_lines:
+        new_lines = statement_to_lines(statement, prefix)
+        return new_lines, lines_to_delta(old_lines, new_lines)
+    if cache.changes is None:
+        return old_lines, []
+    hunks = update_hunks(statement, cache)
+    if hunks is None:
+        statement.render_cache = render_statement(statement, prefix)
+        return statement.render_cache.lines, lines_to_delta(old_lines, statement.render_cache.lines)
+    delta: list[str] = []
+    shift = 0
+    for start, count, lines in hunks:
+        delta.extend(lines_to_delta(old_lines[start:start + count], lines, start, start + shift))
+        shift += len(lines) - count
+    apply_hunks(old_lines, hunks)
+    return old_lines, delta
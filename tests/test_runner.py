@@ -0,0 +1,27 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import shutil
+import unittest
+
+from tactic_interpreter.runner import run_scripts
+
+EXAMPLE = Path(__file__).parent.parent / "examples" / "cheap_energy.txt"
+
+class RunnerTest(unittest.TestCase):
+    def test_crashing_script(self) -> None:
+        with TemporaryDirectory() as directory:
+            shutil.copy(EXAMPLE, Path(directory) / "cheap_energy.txt")
+            # The type is nested too deeply for the recursive parser
+            nested_type = "(" * 1200 + "int" + ")" * 1200
+            (Path(directory) / "crashing.txt").write_text(f"description: Crash\n\nsignature: crash: () -> int\n\nlet: y: {nested_type}\n")
+            for workers in (1, 2):
+                for check in (False, True):
+                    with self.subTest(workers=workers, check=check):
+                        report = run_scripts([f"{directory}/*.txt"], workers, check=check)
+                        outcomes = {Path(outcome.path).name: outcome for outcome in report.outcomes}
+                        self.assertTrue(outcomes["cheap_energy.txt"].result.finished)
+                        self.assertIsNone(outcomes["crashing.txt"].result)
+                        self.assertIn("RecursionError", outcomes["crashing.txt"].error)
+
+if __name__ == "__main__":
+    unittest.main()